@@ -0,0 +1,256 @@
+# Indicateurs glissants et détection de pics, par réseau et par jour calendaire :
+# taux d'engagement 7j / 28j, moyenne mobile des nouveaux abonnés, z-score des engagements.
+# Calculés une fois par rafraîchissement, puis prolongés quand des lignes sont ajoutées.
+# Audience absolue par réseau = abonnés de départ (configurables) + cumul des nouveaux abonnés.
+import copy
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from rollup import taux_vect
+
+SERIES = ['Impressions', 'Engagements', 'Nouveaux Abonnes']
+FENETRE_Z = 28
+MIN_JOURS_Z = 7
+SEUIL_Z = 2.5
+
+
+def _nb_jours(delta):
+    return int(delta.astype(np.int64))
+
+
+class _Reseau:
+    """État d'un réseau : valeurs journalières continues, sommes préfixes et indicateurs dérivés."""
+
+    def __init__(self, debut, valeurs):
+        self.debut = debut                      # datetime64[D] du premier jour
+        self.valeurs = valeurs                  # (n, 3) : Impressions, Engagements, Nouveaux Abonnes
+        self.prefixe = None                     # (n + 1, 4) : + Engagements²
+        self.derives = None                     # (n, 4) : taux 7j, taux 28j, abonnés moy. 7j, z
+        self.calculer(0)
+
+    @property
+    def fin(self):
+        return self.debut + len(self.valeurs) - 1
+
+    def calculer(self, depuis):
+        """Recalcule préfixes et dérivés à partir de la position depuis (le reste est conservé)."""
+        n = len(self.valeurs)
+        v = np.column_stack([self.valeurs, self.valeurs[:, 1] ** 2])
+        prefixe = np.zeros((n + 1, 4))
+        if self.prefixe is not None and depuis > 0:
+            prefixe[:depuis + 1] = self.prefixe[:depuis + 1]
+        prefixe[depuis + 1:] = prefixe[depuis] + np.cumsum(v[depuis:], axis=0)
+        p = np.arange(depuis, n)
+        derives = np.zeros((n, 4))
+        if self.derives is not None and depuis > 0:
+            derives[:depuis] = self.derives[:depuis]
+
+        def somme(fenetre, col, decalage=0):
+            haut = p + 1 - decalage
+            return prefixe[haut, col] - prefixe[np.maximum(haut - fenetre, 0), col]
+
+        for k, fenetre in enumerate((7, 28)):
+            imp, eng = somme(fenetre, 0), somme(fenetre, 1)
+            derives[depuis:, k] = taux_vect(eng, imp)
+        derives[depuis:, 2] = somme(7, 2) / np.minimum(p + 1, 7)
+        # z-score vs les FENETRE_Z jours précédents (jour courant exclu)
+        m = np.minimum(p, FENETRE_Z).astype(np.float64)
+        s, s2 = somme(FENETRE_Z, 1, 1), somme(FENETRE_Z, 3, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            moy = s / m
+            ecart = np.sqrt(np.maximum(s2 / m - moy ** 2, 0))
+            z = (self.valeurs[depuis:, 1] - moy) / ecart
+        derives[depuis:, 3] = np.where((m >= MIN_JOURS_Z) & (ecart > 0), z, 0)
+        self.prefixe, self.derives = prefixe, derives
+
+    def etendre(self, jours, valeurs):
+        """Ajoute des valeurs journalières (jours datetime64[D], éventuellement déjà présents)."""
+        debut = min(self.debut, jours.min())
+        fin = max(self.fin, jours.max())
+        decalage = _nb_jours(self.debut - debut)
+        nouvelles = np.zeros((_nb_jours(fin - debut) + 1, 3))
+        nouvelles[decalage:decalage + len(self.valeurs)] = self.valeurs
+        np.add.at(nouvelles, (jours - debut).astype(np.int64), valeurs)
+        depuis = min(_nb_jours(jours.min() - debut), len(self.valeurs)) if decalage == 0 else 0
+        self.debut, self.valeurs = debut, nouvelles
+        if decalage:
+            self.prefixe = self.derives = None
+        self.calculer(depuis)
+
+    def bornes(self, debut, fin):
+        i = max(_nb_jours(np.datetime64(debut, 'D') - self.debut), 0)
+        j = min(_nb_jours(np.datetime64(fin, 'D') - self.debut) + 1, len(self.valeurs))
+        return i, max(j, i)
+
+
+def _journalier(df):
+    jours = df['Date'].values.astype('datetime64[D]')
+    daily = df[SERIES].assign(Jour=jours, Reseau=df['Reseau'].values).groupby(['Reseau', 'Jour'], observed=True).sum()
+    for net, bloc in daily.groupby(level='Reseau', sort=False, observed=True):
+        yield net, bloc.index.get_level_values('Jour').values.astype('datetime64[D]'), bloc[SERIES].to_numpy(dtype=np.float64)
+
+
+def _empreinte(df):
+    # Somme (mod 2**64) des empreintes de lignes : les indicateurs ne dépendent que de
+    # l'ensemble des lignes (Date, Reseau, séries), pas de leur ordre
+    if not len(df):
+        return 0
+    return int(pd.util.hash_pandas_object(df[['Date', 'Reseau'] + SERIES], index=False).to_numpy().sum(dtype=np.uint64))
+
+
+def charger_bases(path):
+    """Abonnés par réseau avant le premier jour de données ({"LinkedIn": 12000, ...}) ; {} si absent."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {str(k): int(v) for k, v in json.load(f).items()}
+
+
+class IndicateursGlissants:
+    def __init__(self, bases=None):
+        self.bases = dict(bases or {})
+        self.reseaux = {}
+        self.version = None
+        self.n_lignes = 0
+        self._empreinte = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def depuis_frame(cls, df, version=None, bases=None):
+        ind = cls(bases)
+        ind.mettre_a_jour(df, version)
+        return ind
+
+    def prolonger(self, df, version=None):
+        """Nouvel objet à jour pour df (incrémental si possible) ; self reste inchangé."""
+        ind = copy.copy(self)
+        ind._lock = threading.Lock()
+        ind.mettre_a_jour(df, version)
+        return ind
+
+    @staticmethod
+    def _ajouter(reseaux, df):
+        for net, jours, valeurs in _journalier(df):
+            if net in reseaux:
+                # Copie : les lecteurs concurrents gardent l'ancien état jusqu'à l'échange
+                etat = copy.copy(reseaux[net])
+                etat.etendre(jours, valeurs)
+            else:
+                debut = jours.min()
+                dense = np.zeros((_nb_jours(jours.max() - debut) + 1, 3))
+                np.add.at(dense, (jours - debut).astype(np.int64), valeurs)
+                etat = _Reseau(debut, dense)
+            reseaux[net] = etat
+
+    def mettre_a_jour(self, df, version=None):
+        """Prolonge les indicateurs si df = lignes déjà intégrées (inchangées) + lignes ajoutées,
+        sinon recalcule tout (ligne passée corrigée, suppression, réordonnancement...).
+
+        Renvoie True si la mise à jour a été incrémentale."""
+        with self._lock:
+            if version is not None and version == self.version:
+                return True
+            # Empreinte des n_lignes premières lignes : toute correction du passé force un recalcul
+            incremental = 0 < self.n_lignes <= len(df) and _empreinte(df.iloc[:self.n_lignes]) == self._empreinte
+            reseaux, nouvelles = (dict(self.reseaux), df.iloc[self.n_lignes:]) if incremental else ({}, df)
+            if len(nouvelles):
+                self._ajouter(reseaux, nouvelles)
+            self.reseaux = reseaux
+            self._empreinte = (self._empreinte + _empreinte(nouvelles)) % 2 ** 64 if incremental else _empreinte(df)
+            self.n_lignes = len(df)
+            self.version = version
+            return incremental
+
+    # --- Lecture ---
+    def serie(self, debut, fin, reseaux):
+        """Indicateurs journaliers sur [debut, fin] pour les réseaux demandés."""
+        morceaux = []
+        for net in reseaux:
+            etat = self.reseaux.get(net)
+            if etat is None:
+                continue
+            i, j = etat.bornes(debut, fin)
+            if j <= i:
+                continue
+            d = etat.derives[i:j]
+            morceaux.append(pd.DataFrame({
+                'Date': (etat.debut + np.arange(i, j)).astype('datetime64[ns]'),
+                'Reseau': net,
+                'Engagements': etat.valeurs[i:j, 1],
+                'Taux 7j': d[:, 0], 'Taux 28j': d[:, 1], 'Abonnes moy. 7j': d[:, 2], 'z': d[:, 3],
+            }))
+        if not morceaux:
+            return pd.DataFrame(columns=['Date', 'Reseau', 'Engagements', 'Taux 7j', 'Taux 28j', 'Abonnes moy. 7j', 'z'])
+        return pd.concat(morceaux, ignore_index=True)
+
+    def pics(self, debut, fin, reseaux, n=3, seuil=SEUIL_Z):
+        """Jours d'engagement anormalement élevé (z-score >= seuil), du plus marqué au moins marqué."""
+        s = self.serie(debut, fin, reseaux)
+        s = s[(s['z'] >= seuil) & (s['Engagements'] > 0)]
+        return s.nlargest(n, 'z')[['Date', 'Reseau', 'Engagements', 'z']]
+
+    def audience(self, debut, fin, reseaux):
+        """Abonnés par jour et par réseau sur [debut, fin] : base + somme préfixe, O(1) par jour."""
+        jours = np.arange(np.datetime64(debut, 'D'), np.datetime64(fin, 'D') + 1)
+        morceaux = []
+        for net in reseaux:
+            etat = self.reseaux.get(net)
+            if etat is None or not len(jours):
+                continue
+            haut = np.clip((jours - etat.debut).astype(np.int64) + 1, 0, len(etat.valeurs))
+            morceaux.append(pd.DataFrame({
+                'Date': jours.astype('datetime64[ns]'),
+                'Reseau': net,
+                'Audience': self.bases.get(str(net), 0) + etat.prefixe[haut, 2],
+            }))
+        if not morceaux:
+            return pd.DataFrame(columns=['Date', 'Reseau', 'Audience'])
+        return pd.concat(morceaux, ignore_index=True)
+
+    def audience_au(self, jour, reseaux):
+        """Abonnés au soir de jour, tous réseaux demandés confondus."""
+        total = 0.0
+        for net in reseaux:
+            etat = self.reseaux.get(net)
+            if etat is None:
+                continue
+            haut = min(max(_nb_jours(np.datetime64(jour, 'D') - etat.debut) + 1, 0), len(etat.valeurs))
+            total += self.bases.get(str(net), 0) + etat.prefixe[haut, 2]
+        return total
+
+    def taux_glissant(self, fin, reseaux, fenetre=7):
+        """Taux d'engagement sur les fenetre jours se terminant à fin, tous réseaux confondus."""
+        imp = eng = 0.0
+        for net in reseaux:
+            etat = self.reseaux.get(net)
+            if etat is None:
+                continue
+            i, j = etat.bornes(np.datetime64(fin, 'D') - fenetre + 1, fin)
+            imp += etat.prefixe[j, 0] - etat.prefixe[i, 0]
+            eng += etat.prefixe[j, 1] - etat.prefixe[i, 1]
+        return (eng / imp * 100) if imp > 0 else 0
+
+    def agrege(self, debut, fin, reseaux):
+        """Par jour, tous réseaux confondus : taux 7j / 28j et moyenne 7j des nouveaux abonnés."""
+        jours = np.arange(np.datetime64(debut, 'D'), np.datetime64(fin, 'D') + 1)
+        sommes = np.zeros((len(jours), 5))     # imp 7j, eng 7j, imp 28j, eng 28j, abonnés moy. 7j
+        for net in reseaux:
+            etat = self.reseaux.get(net)
+            if etat is None:
+                continue
+            n = len(etat.valeurs)
+            haut = (jours - etat.debut).astype(np.int64) + 1
+            for k, (fenetre, col) in enumerate([(7, 0), (7, 1), (28, 0), (28, 1), (7, 2)]):
+                somme = etat.prefixe[np.clip(haut, 0, n), col] - etat.prefixe[np.clip(haut - fenetre, 0, n), col]
+                # Moyenne des abonnés : même diviseur que _Reseau.calculer (jours disponibles, 7 au plus)
+                sommes[:, k] += somme / np.clip(haut, 1, 7) if k == 4 else somme
+        return pd.DataFrame({
+            'Date': jours.astype('datetime64[ns]'),
+            'Taux 7j': taux_vect(sommes[:, 1], sommes[:, 0]),
+            'Taux 28j': taux_vect(sommes[:, 3], sommes[:, 2]),
+            'Abonnes moy. 7j': sommes[:, 4],
+        })
@@ -1,20 +1,36 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import date, timedelta
-import re 
+from datetime import date, datetime, timedelta
+import os
+
+from analytics import charger_bases
+from assistant import agent_oss
+from comparaison import REFERENCES, MoteurComparaison
+from data_source import SheetSource, SourceRegistry
+from export import FORMATS as EXPORT_FORMATS, exporter, nom_fichier
+from figures import COLORS, FigureCache, fig_cumul, fig_impressions, fig_repartition
+from instrumentation import activer, demarrer_execution, est_actif, etape, export_jsonl, export_prometheus, jauge
+from pagination import paginer
+from rafraichissement import Rafraichisseur
+from reporting import top3
+from rollup import GRANULARITES
+from schema import rapport_memoire
 
 # --- 1. CONFIGURATION ---
 st.set_page_config(page_title="OSS Analytics", page_icon="🍊", layout="wide", initial_sidebar_state="collapsed")
 
+# Panneau admin caché (?admin=1) : bascule du profilage du process (cf. section 12)
+ADMIN = st.query_params.get("admin") == "1"
+run = demarrer_execution()
+
 # PALETTE
 ACCENT = "#FF7900"
 TEXT_MAIN = "#FFFFFF"
 TEXT_SEC = "#A0A0A0"
 GRADIENT_END = "#000000"
-# Définition des couleurs ici
-COLORS = { "LinkedIn": "#0077B5", "Instagram": "#E1306C", "Facebook": "#1877F2", "X": "#FFFFFF" }
+# Couleurs des réseaux : figures.COLORS (partagées avec batch.py)
+# Nombre maximal de messages conservés dans le chat
+CHAT_MAX = 50
 
 # --- 2. CSS & DESIGN ---
 st.markdown(f"""
@@ -263,67 +279,103 @@ st.markdown(f"""
 # 👇👇👇 TON LIEN ICI 👇👇👇
 sheet_url = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQpxQxY8LwNpziX-neBxgl3QNBIXFVLvP0xPRYYTXr9IYeC-u707qXfH2iOqP87p8wPtf_xIA3tqOx1/pub?output=csv"
 
-if "TON_LIEN" in sheet_url:
+# Plusieurs feuilles (une par marque / réseau) : les lister dans sources.json (cf. sources.example.json)
+SOURCES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sources.json")
+# Abonnés de départ par réseau (optionnel, cf. abonnes.example.json)
+BASES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "abonnes.json")
+
+if "TON_LIEN" in sheet_url and not os.path.exists(SOURCES_FILE):
     st.error("🛑 **STOP !** Lien manquant.")
     st.stop()
 
-@st.cache_data(ttl=600)
-def load_data():
-    try:
-        mes_colonnes = ['Date', 'Reseau', 'Impressions', 'Portee', 'Engagements', 'Reactions', 'Interactions', 'Nouveaux Abonnes']
-        df = pd.read_csv(sheet_url, header=0, names=mes_colonnes, usecols=range(8), on_bad_lines='skip')
-        df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce')
-        df = df.dropna(subset=['Date'])
-        df = df.fillna(0)
-        return df
-    except Exception as e:
-        return str(e)
-
-df = load_data()
-if isinstance(df, str) or df is None:
-    st.error(f"⚠️ Erreur: {df}")
+@st.cache_resource
+def get_source():
+    # Un seul objet par process : snapshots et ETag partagés entre toutes les sessions
+    if os.path.exists(SOURCES_FILE):
+        return SourceRegistry.depuis_fichier(SOURCES_FILE)
+    return SourceRegistry([SheetSource(sheet_url)])
+
+@st.cache_resource
+def get_rafraichisseur():
+    # Thread de fond (OSS_REFRESH_SECONDES, 600 s par défaut) : aucune session n'attend le réseau.
+    # Le frame publié est partagé en lecture seule (copy-on-write) par toutes les sessions,
+    # avec son cube, son index par (Reseau, Date) et ses indicateurs glissants.
+    return Rafraichisseur(get_source(), bases=charger_bases(BASES_FILE)).demarrer()
+
+@st.cache_resource(max_entries=2)
+def get_comparaison(version, _cube):
+    return MoteurComparaison(_cube)
+
+@st.cache_resource
+def get_fig_cache():
+    return FigureCache(max_entries=64, max_bytes=64 * 1024 * 1024)
+
+rafraichisseur = get_rafraichisseur()
+with etape("load_data"):
+    snap = rafraichisseur.instantane()
+    if snap is None:
+        # Démarrage à froid sans snapshot disque : seul cas où l'on attend le premier chargement
+        with st.spinner("Chargement initial des données…"):
+            snap = rafraichisseur.instantane(attente=60)
+if snap is None:
+    st.error(f"⚠️ Erreur: {rafraichisseur.erreur[1] if rafraichisseur.erreur else 'données indisponibles'}")
     st.stop()
+df = snap.df
+
+def horodatage(ts):
+    return datetime.fromtimestamp(ts).strftime('%d/%m/%Y %H:%M') if ts else "date inconnue"
+
+if rafraichisseur.erreur:
+    st.warning(f"⚠️ Rafraîchissement en échec ({rafraichisseur.erreur[1]}) : données du {horodatage(snap.donnees_au)} affichées.")
+for nom, err in get_source().erreurs.items():
+    st.warning(f"⚠️ Source « {nom} » indisponible (dernières données connues utilisées) : {err}")
 
 # --- 4. DASHBOARD LOGIC (KPIs, Graphs) ---
 c_head1, c_head2 = st.columns([3, 1])
 with c_head1:
     st.markdown(f"<h2 style='margin-bottom:20px;'>⚡ Orange Startup Studio <span style='color:{ACCENT}'>Analytics</span></h2>", unsafe_allow_html=True)
+with c_head2:
+    st.markdown(f"<div style='text-align:right; color:{TEXT_SEC}; font-size:12px; padding-top:18px;'>🕒 Données au {horodatage(snap.donnees_au)}</div>", unsafe_allow_html=True)
 
 with st.container():
     st.markdown('<div class="glass-header">', unsafe_allow_html=True)
-    c1, c2, c3 = st.columns([1, 1, 2])
+    c1, c2, c3, c4 = st.columns([1, 1, 2, 1])
     with c1: start_date = st.date_input("DÉBUT", date(2025, 9, 1))
     with c2: end_date = st.date_input("FIN", date(2025, 11, 30))
     with c3:
         if 'Reseau' in df.columns:
-            all = df['Reseau'].unique()
+            all = df['Reseau'].unique().tolist()
             choix = st.multiselect("RÉSEAUX", all, default=all)
+    with c4: ref_label = st.selectbox("COMPARER À", list(REFERENCES))
+    ref_custom = None
+    if REFERENCES[ref_label] == "custom":
+        plage = st.date_input("PÉRIODE DE RÉFÉRENCE", (start_date - timedelta(days=365), end_date - timedelta(days=365)))
+        if len(plage) == 2:
+            ref_custom = tuple(plage)
     st.markdown('</div>', unsafe_allow_html=True)
 
-mask_cur = (df['Date'].dt.date >= start_date) & (df['Date'].dt.date <= end_date) & (df['Reseau'].isin(choix))
-df_filt = df.loc[mask_cur].sort_values(by='Date')
+with etape("filtrer"):
+    df_filt = snap.index.selection(start_date, end_date, choix)
+jauge("lignes_total", len(df))
+jauge("lignes_filtrees", len(df_filt))
+
+with etape("cube"):
+    # Cube et indicateurs construits une fois par instantané dans le thread de rafraîchissement
+    cube, indicateurs = snap.cube, snap.indicateurs
+    moteur = get_comparaison(snap.version, cube)
 
-duree = (end_date - start_date).days
-prev_s = start_date - timedelta(days=duree + 1)
-prev_e = start_date - timedelta(days=1)
-mask_prv = (df['Date'].dt.date >= prev_s) & (df['Date'].dt.date <= prev_e) & (df['Reseau'].isin(choix))
-df_prev = df.loc[mask_prv]
+# Référence personnalisée incomplète : on retombe sur la période précédente
+ref_mode = REFERENCES[ref_label] if (REFERENCES[ref_label] != "custom" or ref_custom) else "precedente"
 
 if not df_filt.empty:
-    def get_kpi(col):
-        v = df_filt[col].sum()
-        p = df_prev[col].sum()
-        d = ((v - p) / p * 100) if p > 0 else 0
-        return int(v), d
-
-    imp, d_imp = get_kpi('Impressions')
-    por, d_por = get_kpi('Portee')
-    eng, d_eng = get_kpi('Engagements')
-    abo, d_abo = get_kpi('Nouveaux Abonnes')
-    
-    taux = (eng / imp * 100) if imp > 0 else 0
-    taux_p = (df_prev['Engagements'].sum() / df_prev['Impressions'].sum() * 100) if df_prev['Impressions'].sum() > 0 else 0
-    d_taux = taux - taux_p
+    # Période courante et période de référence lues ensemble dans le cube (résultat en cache)
+    with etape("kpis"):
+        kpis = moteur.comparer(start_date, end_date, choix, ref_mode, ref_custom)
+    imp, d_imp = kpis['Impressions']
+    por, d_por = kpis['Portee']
+    eng, d_eng = kpis['Engagements']
+    abo, d_abo = kpis['Nouveaux Abonnes']
+    taux, d_taux = kpis['Taux']
 
     def kpi_html(icon, label, val, delta, is_pct=False):
         sign = "+" if delta >= 0 else ""
@@ -331,132 +383,167 @@ if not df_filt.empty:
         d_val = f"{sign}{delta:.1f}%" if not is_pct else f"{sign}{delta:.2f} pts"
         return f"""<div class="kpi-card"><div class="kpi-title">{label}</div><div class="kpi-value">{val}</div><div class="kpi-footer"><div style="font-size:20px;">{icon}</div><div class="delta-badge {cls}">{d_val}</div></div></div>"""
 
-    cols = st.columns(5)
-    with cols[0]: st.markdown(kpi_html("👁️", "Impressions", f"{imp:,}".replace(",", " "), d_imp), unsafe_allow_html=True)
-    with cols[1]: st.markdown(kpi_html("📢", "Portée", f"{por:,}".replace(",", " "), d_por), unsafe_allow_html=True)
-    with cols[2]: st.markdown(kpi_html("❤️", "Engagements", f"{eng:,}".replace(",", " "), d_eng), unsafe_allow_html=True)
-    with cols[3]: st.markdown(kpi_html("👥", "Nouveaux Abonnés", f"{abo:,}".replace(",", " "), d_abo), unsafe_allow_html=True)
-    with cols[4]: st.markdown(kpi_html("📈", "Taux d'Engag.", f"{taux:.2f}%", d_taux, is_pct=True), unsafe_allow_html=True)
+    with etape("kpi_html"):
+        cols = st.columns(5)
+        with cols[0]: st.markdown(kpi_html("👁️", "Impressions", f"{imp:,}".replace(",", " "), d_imp), unsafe_allow_html=True)
+        with cols[1]: st.markdown(kpi_html("📢", "Portée", f"{por:,}".replace(",", " "), d_por), unsafe_allow_html=True)
+        with cols[2]: st.markdown(kpi_html("❤️", "Engagements", f"{eng:,}".replace(",", " "), d_eng), unsafe_allow_html=True)
+        with cols[3]: st.markdown(kpi_html("👥", "Nouveaux Abonnés", f"{abo:,}".replace(",", " "), d_abo), unsafe_allow_html=True)
+        with cols[4]: st.markdown(kpi_html("📈", "Taux d'Engag.", f"{taux:.2f}%", d_taux, is_pct=True), unsafe_allow_html=True)
+    ref_s, ref_e = kpis['reference']
+    st.caption(f"Variations vs {ref_s.strftime('%d/%m/%Y')} → {ref_e.strftime('%d/%m/%Y')}")
 
     st.markdown("###")
-    df_top3 = df_filt.nlargest(3, 'Engagements')[['Date', 'Reseau', 'Engagements']]
+    # Pics d'engagement par z-score (vs 28 jours précédents) ; à défaut, plus gros volumes
+    with etape("indicateurs.pics"):
+        pics = indicateurs.pics(start_date, end_date, choix)
+        superposition = indicateurs.agrege(start_date, end_date, choix)
+    df_top3 = pics if not pics.empty else top3(df_filt)
     
-    def make_chart_transparent(fig):
-        fig.update_layout(template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(family="Poppins", color="#E0E0E0"), margin=dict(l=0, r=0, t=40, b=0), hovermode="x unified")
-        fig.update_xaxes(showgrid=False, showline=False)
-        fig.update_yaxes(showgrid=True, gridcolor='rgba(255,255,255,0.05)', zeroline=False)
-        return fig
+    # Figures mises en cache par état de filtre : une interaction sans changement de filtre ne les reconstruit pas
+    fig_cache = get_fig_cache()
+    fig_key = (cube.version, start_date, end_date, tuple(sorted(choix)))
 
     c_g1, c_g2 = st.columns([2, 1])
     with c_g1:
         st.markdown("##### 📈 Croissance de la Communauté")
-        df_cum = df_filt.copy()
-        df_cum['Cumul'] = df_cum.groupby('Reseau')['Nouveaux Abonnes'].cumsum()
-        fig = px.area(df_cum, x='Date', y='Cumul', color='Reseau', color_discrete_map=COLORS)
-        fig.update_traces(line_shape='spline', fill='tozeroy')
-        st.plotly_chart(make_chart_transparent(fig), use_container_width=True)
+        with etape("figure.cumul"):
+            fig = fig_cache.get(fig_key + ("cumul",), lambda: fig_cumul(indicateurs.audience(start_date, end_date, choix), COLORS, superposition=superposition))
+            st.plotly_chart(fig, use_container_width=True)
 
     with c_g2:
-        st.markdown("##### 🏆 Top 3 Meilleurs Jours")
+        st.markdown("##### ⚡ Pics d'engagement" if not pics.empty else "##### 🏆 Top 3 Meilleurs Jours")
         html_top3 = ""
-        for index, row in df_top3.iterrows():
+        for rang, (_, row) in enumerate(df_top3.iterrows(), 1):
             date_fmt = row['Date'].strftime('%d %b')
-            html_top3 += f"""<div class="top3-row"><div style="display:flex; align-items:center;"><span class="top3-rank">#{list(df_top3.index).index(index)+1}</span><span class="top3-date">{date_fmt}</span><span class="top3-net">({row['Reseau']})</span></div><div class="top3-val">{int(row['Engagements'])} Eng.</div></div>"""
-        st.markdown(f"""<div class="kpi-card" style="height:auto; min-height:300px;">{html_top3}<div style="margin-top:20px; font-size:12px; color:#AAA; text-align:center;">Basé sur le volume d'interactions</div></div>""", unsafe_allow_html=True)
+            z_txt = f" · z {row['z']:.1f}" if 'z' in row else ""
+            html_top3 += f"""<div class="top3-row"><div style="display:flex; align-items:center;"><span class="top3-rank">#{rang}</span><span class="top3-date">{date_fmt}</span><span class="top3-net">({row['Reseau']})</span></div><div class="top3-val">{int(row['Engagements'])} Eng.{z_txt}</div></div>"""
+        legende = "Écart à la moyenne des 28 jours précédents (z-score)" if not pics.empty else "Basé sur le volume d'interactions"
+        st.markdown(f"""<div class="kpi-card" style="height:auto; min-height:300px;">{html_top3}<div style="margin-top:20px; font-size:12px; color:#AAA; text-align:center;">{legende}</div></div>""", unsafe_allow_html=True)
 
     st.markdown("###")
     c_g3, c_g4 = st.columns([1, 1])
     with c_g3:
         st.markdown("##### 🍩 Répartition")
-        fig = px.pie(df_filt, values='Impressions', names='Reseau', color='Reseau', color_discrete_map=COLORS, hole=0.7)
-        fig.update_traces(textinfo='percent', textfont_size=14, marker=dict(line=dict(color='#000000', width=2)))
-        st.plotly_chart(make_chart_transparent(fig), use_container_width=True)
+        with etape("figure.repartition"):
+            fig = fig_cache.get(fig_key + ("repartition",), lambda: fig_repartition(df_filt, COLORS))
+            st.plotly_chart(fig, use_container_width=True)
     with c_g4:
         st.markdown("##### 📊 Impressions")
-        fig = px.line(df_filt, x='Date', y='Impressions', color='Reseau', color_discrete_map=COLORS)
-        fig.update_traces(line_shape='spline', line_width=4)
-        st.plotly_chart(make_chart_transparent(fig), use_container_width=True)
+        with etape("figure.impressions"):
+            fig = fig_cache.get(fig_key + ("impressions",), lambda: fig_impressions(df_filt, COLORS, superposition=superposition, pics=pics))
+            st.plotly_chart(fig, use_container_width=True)
 
     # --- 10. DATA & EXPORT ---
     st.markdown("###")
-    c_data, c_btn = st.columns([4, 1])
-    with c_data: st.markdown("##### 📑 Données détaillées")
-    with c_btn:
-        csv = df_filt.to_csv(index=False).encode('utf-8')
-        st.download_button("📥 Exporter CSV", data=csv, file_name="reporting_oss.csv", mime="text/csv", type="primary", use_container_width=True)
-
-    tab1, tab2 = st.tabs(["🗓️ Mensuel", "🔎 Journalier"])
-    with tab1:
-        df_m = df_filt.copy()
-        df_m['Mois'] = df_m['Date'].dt.strftime('%Y-%m')
-        grp = df_m.groupby(['Mois', 'Reseau'])[['Impressions', 'Portee', 'Engagements', 'Nouveaux Abonnes', 'Interactions']].sum().reset_index()
-        grp["Taux"] = grp.apply(lambda x: (x['Engagements']/x['Impressions']*100) if x['Impressions']>0 else 0, axis=1).apply(lambda x: f"{x:.2f} %")
-        st.dataframe(grp, use_container_width=True)
-    with tab2:
-        st.dataframe(df_filt, use_container_width=True)
+
+    # Fragments : un widget d'une section ne relance que cette section, pas tout le script
+    @st.fragment
+    def section_export(df_filt):
+        c_data, c_fmt, c_btn = st.columns([3, 1, 1])
+        with c_data: st.markdown("##### 📑 Données détaillées")
+        with c_fmt:
+            fmt_export = st.selectbox("Format", list(EXPORT_FORMATS), label_visibility="collapsed")
+        with c_btn:
+            # Fichier généré seulement au clic (callable), écrit par blocs
+            st.download_button(f"📥 Exporter {fmt_export.split(' ')[0]}", data=lambda: exporter(df_filt, fmt_export), file_name=nom_fichier(fmt_export), mime=EXPORT_FORMATS[fmt_export][1], on_click="ignore", type="primary", use_container_width=True)
+
+    section_export(df_filt)
+
+    def tableau_pagine(data, key, **kwargs):
+        # Filtre / tri / page appliqués côté serveur : seule la page est envoyée au navigateur
+        c_f, c_t, c_o, c_s, c_p = st.columns([2, 2, 1, 1, 1])
+        with c_f: texte = st.text_input("Filtrer", key=f"{key}_filtre", placeholder="🔍 Réseau…", label_visibility="collapsed")
+        with c_t: tri = st.selectbox("Trier par", ["Ordre d'origine"] + list(data.columns), key=f"{key}_tri", label_visibility="collapsed")
+        with c_o: croissant = st.toggle("↑", value=True, key=f"{key}_asc")
+        with c_s: taille = st.selectbox("Lignes", [25, 50, 100, 250], index=1, key=f"{key}_taille", label_visibility="collapsed")
+        with c_p: page = st.number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page", label_visibility="collapsed")
+        tri = None if tri not in data.columns else tri
+        page_df, total, nb_pages = paginer(data, int(page), taille, tri, croissant, texte)
+        st.dataframe(page_df, use_container_width=True, **kwargs)
+        premiere = (min(int(page), nb_pages) - 1) * taille
+        st.caption(f"Lignes {min(premiere + 1, total)}–{premiere + len(page_df)} sur **{total}** · page {min(int(page), nb_pages)}/{nb_pages}")
+
+    @st.fragment
+    def section_tableaux(cube, df_filt, start_date, end_date, choix):
+        # on_change="rerun" : seul l'onglet ouvert est calculé (rerun limité au fragment)
+        tab1, tab2 = st.tabs(["🗓️ Mensuel", "🔎 Journalier"], on_change="rerun", key="onglet_tableaux")
+        if tab1.open:
+            with tab1:
+                gran = st.radio("Granularité", list(GRANULARITES), index=1, horizontal=True, label_visibility="collapsed")
+                with etape("tableau.periodes"):
+                    grp = cube.par_periode(start_date, end_date, choix, GRANULARITES[gran], gran)
+                    # Mise en forme uniquement à l'affichage
+                    grp[gran] = grp[gran].astype(str)
+                    tableau_pagine(grp, "mensuel", column_config={"Taux": st.column_config.NumberColumn(format="%.2f %%")})
+        if tab2.open:
+            with tab2:
+                with etape("tableau.journalier"):
+                    # df_filt est déjà trié par date (IndexReseaux.selection)
+                    tableau_pagine(df_filt, "journalier", hide_index=True)
+
+    section_tableaux(cube, df_filt, start_date, end_date, choix)
+
+    with st.expander("🧪 Qualité & mémoire des données"):
+        rapport = get_source().rapport
+        c_q, c_mem = st.columns([1, 2])
+        with c_q:
+            st.markdown(f"**{rapport['lignes_lues']:,}** lignes lues".replace(",", " "))
+            st.markdown(f"Lignes malformées ignorées : **{rapport['lignes_malformees']}**")
+            st.markdown(f"Dates invalides ou hors plage ignorées : **{rapport['dates_invalides']}**")
+            st.markdown(f"Lignes sans réseau ignorées : **{rapport.get('reseaux_manquants', 0)}**")
+            st.markdown(f"Valeurs non numériques mises à 0 : **{rapport['valeurs_invalides']}**")
+        with c_mem:
+            st.dataframe(rapport_memoire(df), use_container_width=True)
 
 
     # --- 11. CHATBOT FLOTTANT INTÉGRÉ ---
 
+    def message_chat(role, msg):
+        # HTML produit une seule fois par message, puis réutilisé à chaque affichage
+        cls = "bot-msg" if role == "bot" else "user-msg"
+        return {"role": role, "msg": msg, "html": f'<div class="chat-msg {cls}">{msg}</div>'}
+
+    def ajouter_message(role, msg):
+        historique = st.session_state.chat_history
+        historique.append(message_chat(role, msg))
+        del historique[:-CHAT_MAX]
+
     # Etat du chat
     if "chat_open" not in st.session_state:
         st.session_state.chat_open = False
     if "chat_history" not in st.session_state:
-        st.session_state.chat_history = [{"role": "bot", "msg": "👋 Hello ! Je suis l'Assistant OSS. Posez-moi une question !"}]
+        st.session_state.chat_history = [message_chat("bot", "👋 Hello ! Je suis l'Assistant OSS. Posez-moi une question !")]
 
     def toggle_chat():
         st.session_state.chat_open = not st.session_state.chat_open
 
-    # Intelligence Artificielle (Simplifiée)
-    def agent_oss(question, df_source):
-        q = question.lower()
-        filter_net = None
-        if "linkedin" in q: filter_net = "LinkedIn"
-        elif "instagram" in q: filter_net = "Instagram"
-        elif "facebook" in q: filter_net = "Facebook"
-        elif "x" in q or "twitter" in q: filter_net = "X"
-        
-        df_chat = df_source[df_source['Reseau'] == filter_net] if filter_net else df_source
-        net_name = filter_net if filter_net else "tous les réseaux"
-        response = "Je ne suis pas sûr. Essayez 'Impressions', 'Engagements', 'Abonnés' ou 'Meilleur jour'."
-        
-        if "impression" in q or "vue" in q:
-            val = int(df_chat['Impressions'].sum())
-            response = f"👀 Total **Impressions** ({net_name}) : **{val:,}**.".replace(",", " ")
-        elif "engagement" in q or "reac" in q or "like" in q:
-            val = int(df_chat['Engagements'].sum())
-            response = f"❤️ Total **Engagements** ({net_name}) : **{val:,}**.".replace(",", " ")
-        elif "abonne" in q or "suivi" in q or "follower" in q:
-            val = int(df_chat['Nouveaux Abonnes'].sum())
-            response = f"👥 Nouveaux **Abonnés** ({net_name}) : **{val:,}**.".replace(",", " ")
-        elif "meilleur" in q or "top" in q or "record" in q:
-            if not df_chat.empty:
-                best = df_chat.loc[df_chat['Engagements'].idxmax()]
-                response = f"🏆 Record le **{best['Date'].strftime('%d %b')}** sur **{best['Reseau']}** : **{int(best['Engagements'])} Eng.**"
-            else:
-                response = "Pas assez de données."
-        elif "portée" in q or "reach" in q:
-            val = int(df_chat['Portee'].sum())
-            response = f"📢 **Portée** (Reach) : **{val:,}**.".replace(",", " ")
-        return response
-
-    # --- AFFICHAGE DE LA FENÊTRE DE CHAT (Si ouverte) ---
-    if st.session_state.chat_open:
+    def envoyer_question(cube, start_date, end_date, choix, indicateurs):
+        question = st.session_state.chat_question
+        if question:
+            ajouter_message("user", question)
+            ajouter_message("bot", agent_oss(question, cube, start_date, end_date, choix, indicateurs=indicateurs))
+
+    # Fragment : ouvrir, fermer ou questionner le chat ne relance pas le dashboard
+    @st.fragment
+    def section_chat(cube, start_date, end_date, choix, indicateurs):
+        # --- AFFICHAGE DE LA FENÊTRE DE CHAT (Si ouverte) ---
+        if st.session_state.chat_open:
+            fenetre_chat(cube, start_date, end_date, choix, indicateurs)
+        bouton_chat()
+
+    def fenetre_chat(cube, start_date, end_date, choix, indicateurs):
         # BOUTON FERMETURE EXPLICITE (Top Right)
         # On utilise une colonne fictive pour le placer via CSS
         c_close = st.container()
         with c_close:
             st.markdown('<div class="stButton close-chat-btn">', unsafe_allow_html=True)
-            if st.button("✖", key="close_chat_x"):
-                st.session_state.chat_open = False
-                st.rerun()
+            # Callbacks (on_click) : état modifié avant le rerun du fragment, pas de st.rerun()
+            st.button("✖", key="close_chat_x", on_click=toggle_chat)
             st.markdown('</div>', unsafe_allow_html=True)
 
-        # 1. Structure HTML de la fenêtre (Header + Messages)
-        chat_html = ""
-        for chat in st.session_state.chat_history:
-            cls = "bot-msg" if chat["role"] == "bot" else "user-msg"
-            chat_html += f'<div class="chat-msg {cls}">{chat["msg"]}</div>'
+        # 1. Structure HTML de la fenêtre (Header + Messages) : historique borné, jointure linéaire
+        chat_html = "".join(chat["html"] for chat in st.session_state.chat_history)
         
         st.markdown(f"""
         <div class="chat-window">
@@ -475,59 +562,72 @@ if not df_filt.empty:
             with st.form(key="chat_form", clear_on_submit=True):
                 col_in, col_sub = st.columns([5, 1])
                 with col_in:
-                    user_input = st.text_input("", placeholder="Posez une question...", label_visibility="collapsed")
+                    st.text_input("", key="chat_question", placeholder="Posez une question...", label_visibility="collapsed")
                 with col_sub:
-                    submit = st.form_submit_button("➤")
+                    st.form_submit_button("➤", on_click=envoyer_question, args=(cube, start_date, end_date, choix, indicateurs))
             st.markdown('</div>', unsafe_allow_html=True)
 
-            if submit and user_input:
-                st.session_state.chat_history.append({"role": "user", "msg": user_input})
-                bot_resp = agent_oss(user_input, df_filt)
-                st.session_state.chat_history.append({"role": "bot", "msg": bot_resp})
-                st.rerun()
-
     # --- BOUTON FLOTTANT (FAB) ---
-    c_fab = st.container()
-    with c_fab:
-        st.markdown("""
-        <style>
-            div.stButton.fab-btn > button {
-                position: fixed;
-                bottom: 30px;
-                right: 30px;
-                width: 60px;
-                height: 60px;
-                border-radius: 50%;
-                background: linear-gradient(135deg, #FF7900, #FF4500);
-                color: white;
-                font-size: 24px;
-                border: none;
-                box-shadow: 0 4px 20px rgba(255, 121, 0, 0.4);
-                z-index: 999999;
-                transition: transform 0.2s;
-            }
-            div.stButton.fab-btn > button:hover {
-                transform: scale(1.1);
-            }
-        </style>
-        """, unsafe_allow_html=True)
+    def bouton_chat():
+        c_fab = st.container()
+        with c_fab:
+            st.markdown("""
+            <style>
+                div.stButton.fab-btn > button {
+                    position: fixed;
+                    bottom: 30px;
+                    right: 30px;
+                    width: 60px;
+                    height: 60px;
+                    border-radius: 50%;
+                    background: linear-gradient(135deg, #FF7900, #FF4500);
+                    color: white;
+                    font-size: 24px;
+                    border: none;
+                    box-shadow: 0 4px 20px rgba(255, 121, 0, 0.4);
+                    z-index: 999999;
+                    transition: transform 0.2s;
+                }
+                div.stButton.fab-btn > button:hover {
+                    transform: scale(1.1);
+                }
+            </style>
+            """, unsafe_allow_html=True)
         
-        # Le bouton FAB affiche 💬 quand fermé, et rien quand ouvert (car la fenêtre a sa propre croix)
-        # Ou on peut laisser le FAB pour rouvrir si on ferme
-        if not st.session_state.chat_open:
-            st.markdown('<div class="stButton fab-btn">', unsafe_allow_html=True)
-            if st.button("💬", key="open_chat_fab"):
-                toggle_chat()
-                st.rerun()
-            st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            # Quand ouvert, on peut aussi afficher le FAB en mode "Fermer" si on veut
-            # Mais ici on a mis la croix en haut
-            st.markdown('<div class="stButton fab-btn">', unsafe_allow_html=True)
-            if st.button("❌", key="close_chat_fab"):
-                toggle_chat()
-                st.rerun()
-            st.markdown('</div>', unsafe_allow_html=True)
+            # Le bouton FAB affiche 💬 quand fermé, et rien quand ouvert (car la fenêtre a sa propre croix)
+            # Ou on peut laisser le FAB pour rouvrir si on ferme
+            if not st.session_state.chat_open:
+                st.markdown('<div class="stButton fab-btn">', unsafe_allow_html=True)
+                st.button("💬", key="open_chat_fab", on_click=toggle_chat)
+                st.markdown('</div>', unsafe_allow_html=True)
+            else:
+                # Quand ouvert, on peut aussi afficher le FAB en mode "Fermer" si on veut
+                # Mais ici on a mis la croix en haut
+                st.markdown('<div class="stButton fab-btn">', unsafe_allow_html=True)
+                st.button("❌", key="close_chat_fab", on_click=toggle_chat)
+                st.markdown('</div>', unsafe_allow_html=True)
+
+    section_chat(cube, start_date, end_date, choix, indicateurs)
 
 else:
     st.info("Sélectionnez une période.")
+
+# --- 12. ADMIN : PROFILAGE DU RERUN ---
+if ADMIN:
+    with st.expander("🛠️ Admin — profilage", expanded=True):
+        # Callback exécuté avant le rerun suivant : demarrer_execution() voit déjà le nouvel état
+        st.toggle("Profilage actif (process)", value=est_actif(), key="profilage_actif",
+                  on_change=lambda: activer(st.session_state.profilage_actif))
+        if run is not None:
+            st.markdown(f"**Rerun : {run.total() * 1000:.1f} ms** mesurés")
+            st.dataframe(pd.DataFrame([(n, d * 1000) for n, d in run.etapes], columns=["Étape", "ms"]), use_container_width=True, column_config={"ms": st.column_config.NumberColumn(format="%.2f")})
+            c_cpt, c_jauge = st.columns(2)
+            with c_cpt: st.dataframe(pd.DataFrame([(n, r, v) for (n, r), v in run.compteurs.items()], columns=["Cache", "Résultat", "Nombre"]), use_container_width=True)
+            with c_jauge: st.dataframe(pd.DataFrame(list(run.jauges.items()), columns=["Jauge", "Valeur"]), use_container_width=True)
+        c_j1, c_j2, c_p = st.columns(3)
+        with c_j1: st.download_button("Rerun (JSONL)", data=export_jsonl(run) if run is not None else "", file_name="rerun.jsonl", mime="application/jsonl", on_click="ignore")
+        with c_j2: st.download_button("Process (JSONL)", data=lambda: export_jsonl(), file_name="process.jsonl", mime="application/jsonl", on_click="ignore")
+        with c_p: st.download_button("Prometheus", data=lambda: export_prometheus(), file_name="metrics.prom", mime="text/plain", on_click="ignore")
+        st.caption(f"Dernière revalidation : {horodatage(snap.verifie_le)} · intervalle {rafraichisseur.intervalle} s")
+        if st.button("🔄 Rafraîchir maintenant"):
+            rafraichisseur.demander()
@@ -0,0 +1,182 @@
+# Assistant du chat : analyse intention / entités puis réponse depuis le cube (rollup.py).
+# Questions du type "impressions LinkedIn en octobre", "meilleur jour Instagram semaine dernière".
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from comparaison import fin_mois
+from rollup import taux_engagement
+
+MOIS = {
+    "janvier": 1, "janv": 1, "fevrier": 2, "fevr": 2, "fev": 2, "mars": 3, "avril": 4, "avr": 4, "mai": 5,
+    "juin": 6, "juillet": 7, "juil": 7, "aout": 8, "septembre": 9, "sept": 9, "octobre": 10, "oct": 10,
+    "novembre": 11, "nov": 11, "decembre": 12, "dec": 12,
+}
+MOIS_NOMS = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août", "septembre", "octobre", "novembre", "décembre"]
+
+ALIAS_RESEAUX = {"linkedin": "LinkedIn", "instagram": "Instagram", "insta": "Instagram", "facebook": "Facebook", "fb": "Facebook", "x": "X", "twitter": "X"}
+
+# préfixe de mot -> métrique (l'ordre compte : premier trouvé)
+MOTS_METRIQUES = [
+    ("taux", "Taux"),
+    ("impression", "Impressions"), ("vue", "Impressions"),
+    ("engagement", "Engagements"), ("like", "Engagements"),
+    ("reaction", "Reactions"), ("reac", "Engagements"),
+    ("interaction", "Interactions"), ("clic", "Interactions"),
+    ("abonne", "Nouveaux Abonnes"), ("suivi", "Nouveaux Abonnes"), ("follower", "Nouveaux Abonnes"),
+    ("portee", "Portee"), ("reach", "Portee"),
+]
+MOTS_MEILLEUR = ("meilleur", "top", "record", "pic", "max")
+MOTS_TENDANCE = ("tendance", "glissant", "moyenne", "moy")
+MOTS_ANOMALIE = ("anomal", "inhabituel", "atypique", "spike", "exceptionnel")
+MOTS_AUDIENCE = ("audience", "communaute")
+
+AIDE = "Je ne suis pas sûr. Essayez 'Impressions', 'Engagements', 'Abonnés', 'Meilleur jour', 'Tendance' ou 'Anomalies'."
+
+
+@dataclass
+class Requete:
+    metrique: str = None
+    meilleur: bool = False
+    tendance: bool = False
+    anomalie: bool = False
+    audience: bool = False
+    reseaux: list = field(default_factory=list)
+    debut: date = None
+    fin: date = None
+    periode: str = None
+
+
+def _tokens(question):
+    sans_accents = unicodedata.normalize("NFKD", question.lower())
+    sans_accents = "".join(c for c in sans_accents if not unicodedata.combining(c))
+    return re.findall(r"[a-z0-9]+", sans_accents)
+
+
+def _periode(tokens, aujourdhui):
+    """(debut, fin, libellé) reconnus dans la question, ou None."""
+    texte = " ".join(tokens)
+    annees = [int(t) for t in tokens if re.fullmatch(r"20\d\d", t)]
+    lundi = aujourdhui - timedelta(days=aujourdhui.weekday())
+    if "hier" in tokens:
+        j = aujourdhui - timedelta(days=1)
+        return j, j, "hier"
+    if "aujourd" in tokens:
+        return aujourdhui, aujourdhui, "aujourd'hui"
+    m = re.search(r"(\d+) derni\w* (jour|semaine|mois)|derni\w* (\d+) (jour|semaine|mois)", texte)
+    if m:
+        n = int(m.group(1) or m.group(3))
+        unite = m.group(2) or m.group(4)
+        jours = n * {"jour": 1, "semaine": 7, "mois": 30}[unite]
+        return aujourdhui - timedelta(days=jours - 1), aujourdhui, f"{n} derniers {unite}s".replace("moiss", "mois")
+    if re.search(r"semaine (derniere|precedente|passee)", texte):
+        return lundi - timedelta(days=7), lundi - timedelta(days=1), "semaine dernière"
+    if re.search(r"cette semaine", texte):
+        return lundi, aujourdhui, "cette semaine"
+    if re.search(r"mois (dernier|precedent|passe)", texte):
+        fin = aujourdhui.replace(day=1) - timedelta(days=1)
+        return fin.replace(day=1), fin, f"{MOIS_NOMS[fin.month - 1]} {fin.year}"
+    if re.search(r"ce mois", texte):
+        return aujourdhui.replace(day=1), aujourdhui, "ce mois-ci"
+    if re.search(r"annee (derniere|precedente|passee)", texte):
+        a = aujourdhui.year - 1
+        return date(a, 1, 1), date(a, 12, 31), str(a)
+    if re.search(r"cette annee", texte):
+        return date(aujourdhui.year, 1, 1), aujourdhui, str(aujourdhui.year)
+    mois = [MOIS[t] for t in tokens if t in MOIS]
+    if mois:
+        m = mois[0]
+        # Sans année : dernière occurrence passée du mois
+        a = annees[0] if annees else (aujourdhui.year if m <= aujourdhui.month else aujourdhui.year - 1)
+        return date(a, m, 1), fin_mois(a, m), f"{MOIS_NOMS[m - 1]} {a}"
+    if annees:
+        return date(annees[0], 1, 1), date(annees[0], 12, 31), str(annees[0])
+    return None
+
+
+def analyser(question, reseaux_connus=(), aujourdhui=None):
+    aujourdhui = aujourdhui or date.today()
+    tokens = _tokens(question)
+    req = Requete()
+    alias = dict(ALIAS_RESEAUX)
+    alias.update({str(r).lower(): r for r in reseaux_connus})
+    # Mots entiers uniquement : "x" ne matche plus "exemple"
+    for t in tokens:
+        if t in alias and alias[t] not in req.reseaux:
+            req.reseaux.append(alias[t])
+    req.meilleur = any(t.startswith(MOTS_MEILLEUR) for t in tokens)
+    req.tendance = any(t.startswith(MOTS_TENDANCE) for t in tokens)
+    req.anomalie = any(t.startswith(MOTS_ANOMALIE) for t in tokens)
+    req.audience = any(t.startswith(MOTS_AUDIENCE) for t in tokens)
+    for prefixe, metrique in MOTS_METRIQUES:
+        if any(t.startswith(prefixe) for t in tokens):
+            req.metrique = metrique
+            break
+    periode = _periode(tokens, aujourdhui)
+    if periode:
+        req.debut, req.fin, req.periode = periode
+    return req
+
+
+def _nombre(val):
+    return f"{int(val):,}".replace(",", " ")
+
+
+def _glissant(req, indicateurs, debut, fin, reseaux, contexte):
+    if req.audience:
+        return f"👥 **Communauté** ({contexte}, au {fin.strftime('%d/%m')}) : **{_nombre(indicateurs.audience_au(fin, reseaux))}** abonnés."
+    if req.anomalie:
+        pics = indicateurs.pics(debut, fin, reseaux)
+        if pics.empty:
+            return f"✅ Aucun pic d'engagement inhabituel ({contexte})."
+        lignes = [f"**{p['Date'].strftime('%d %b')}** sur **{p['Reseau']}** : {int(p['Engagements'])} Eng. (z = {p['z']:.1f})" for _, p in pics.iterrows()]
+        return "⚡ Pics inhabituels : " + " · ".join(lignes)
+    if req.metrique == "Nouveaux Abonnes":
+        moy = indicateurs.agrege(fin, fin, reseaux)['Abonnes moy. 7j'].iloc[0]
+        return f"👥 Moyenne **7 jours** des nouveaux abonnés ({contexte}, au {fin.strftime('%d/%m')}) : **{moy:.1f}**/jour."
+    t7, t28 = indicateurs.taux_glissant(fin, reseaux, 7), indicateurs.taux_glissant(fin, reseaux, 28)
+    sens = "↗️" if t7 >= t28 else "↘️"
+    return f"{sens} **Taux d'engagement glissant** ({contexte}, au {fin.strftime('%d/%m')}) : **{t7:.2f}%** sur 7j, **{t28:.2f}%** sur 28j."
+
+
+def agent_oss(question, cube, debut, fin, choix, aujourdhui=None, indicateurs=None):
+    """Répond depuis le cube ; période et réseaux par défaut = sélection du dashboard.
+
+    indicateurs (analytics.IndicateursGlissants) active les questions de tendance, d'anomalie et d'audience."""
+    req = analyser(question, cube.reseaux.keys(), aujourdhui)
+    glissant = indicateurs is not None and (req.tendance or req.anomalie or req.audience)
+    if req.metrique is None and not req.meilleur and not glissant:
+        return AIDE
+    reseaux = req.reseaux or list(choix)
+    debut, fin = (req.debut, req.fin) if req.debut else (debut, fin)
+    net_name = ", ".join(req.reseaux) if req.reseaux else "tous les réseaux"
+    contexte = f"{net_name}, {req.periode}" if req.periode else net_name
+
+    if glissant:
+        return _glissant(req, indicateurs, debut, fin, reseaux, contexte)
+
+    if req.meilleur:
+        metrique = req.metrique if req.metrique not in (None, "Taux") else "Engagements"
+        best = cube.meilleur_jour(debut, fin, reseaux, metrique)
+        if best is None:
+            return "Pas assez de données."
+        jour, net, val = best
+        unite = "Eng." if metrique == "Engagements" else metrique
+        return f"🏆 Record le **{jour.strftime('%d %b')}** sur **{net}** : **{int(val)} {unite}**"
+
+    tot = cube.totaux(debut, fin, reseaux)
+    if tot['n'] == 0:
+        return f"Pas de données ({contexte})."
+    if req.metrique == "Taux":
+        return f"📈 **Taux d'engagement** ({contexte}) : **{taux_engagement(tot['Engagements'], tot['Impressions']):.2f}%**."
+    val = _nombre(tot[req.metrique])
+    if req.metrique == "Impressions":
+        return f"👀 Total **Impressions** ({contexte}) : **{val}**."
+    if req.metrique == "Engagements":
+        return f"❤️ Total **Engagements** ({contexte}) : **{val}**."
+    if req.metrique == "Nouveaux Abonnes":
+        return f"👥 Nouveaux **Abonnés** ({contexte}) : **{val}**."
+    if req.metrique == "Portee":
+        return f"📢 **Portée** (Reach, {contexte}) : **{val}**."
+    return f"📊 Total **{req.metrique}** ({contexte}) : **{val}**."
@@ -0,0 +1,259 @@
+# Génération de rapports hors navigateur : KPIs + graphiques du dashboard pour une liste
+# de jobs (période, réseaux), rendus en HTML / JSON / PNG par un pool de process.
+#   python batch.py --source data.csv --mois 2025-09,2025-10 --par-reseau --sortie rapports
+#   python batch.py --jobs jobs.json --formats html,json,png --workers 8
+# jobs.json : [{"nom": "...", "debut": "2025-09-01", "fin": "2025-09-30", "reseaux": ["LinkedIn"], "reference": "annee"}]
+#   "reference": "custom" demande "reference_custom": ["2024-09-01", "2024-09-30"]
+# Le jeu de données est chargé une fois dans le process parent ; avec fork, frame, cube et
+# indicateurs sont hérités par les workers (pages partagées), sinon relus depuis un Parquet.
+import argparse
+import html
+import importlib.util
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from analytics import IndicateursGlissants, charger_bases
+from comparaison import REFERENCES, MoteurComparaison
+from data_source import SheetSource, SourceRegistry, lire_parquet, sauver_parquet
+from figures import COLORS, fig_cumul, fig_impressions, fig_repartition
+from reporting import construire_cube, construire_index
+
+FORMATS = ("html", "json", "png")
+SOURCES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sources.json")
+BASES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "abonnes.json")
+
+# État du worker : df, index, cube, moteur, indicateurs (hérité par fork ou chargé par _init_worker)
+_ETAT = {}
+
+
+def _preparer(df, version=None, bases=None):
+    cube = construire_cube(df, version)
+    _ETAT.update(df=df, index=construire_index(df, version), cube=cube, moteur=MoteurComparaison(cube),
+                 indicateurs=IndicateursGlissants.depuis_frame(df, version, bases))
+
+
+def _init_worker(parquet, bases=None):
+    if parquet is not None:
+        df, infos = lire_parquet(parquet)
+        _preparer(df, infos.get("version"), bases)
+
+
+def charger_source(source=None):
+    if source:
+        return SheetSource(source)
+    if os.path.exists(SOURCES_FILE):
+        return SourceRegistry.depuis_fichier(SOURCES_FILE)
+    raise SystemExit("Aucune source : --source URL|fichier ou sources.json")
+
+
+def jobs_mensuels(mois, reseaux, par_reseau=False):
+    """Un job par mois (AAAA-MM), tous réseaux confondus, plus un par réseau si par_reseau."""
+    jobs = []
+    for m in mois:
+        p = pd.Period(m, freq='M')
+        groupes = [list(reseaux)] + ([[r] for r in reseaux] if par_reseau else [])
+        for g in groupes:
+            nom = f"{m}_{g[0] if len(g) == 1 else 'tous'}".replace("/", "-").replace("\\", "-")
+            jobs.append({"nom": nom, "debut": str(p.start_time.date()), "fin": str(p.end_time.date()), "reseaux": g})
+    return jobs
+
+
+def _date_iso(valeur):
+    try:
+        return date.fromisoformat(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+def valider_jobs(jobs):
+    """Liste des problèmes des jobs (vide si tous sont exécutables)."""
+    if not isinstance(jobs, list):
+        return ["la liste des jobs doit être un tableau JSON"]
+    problemes = []
+    for i, job in enumerate(jobs):
+        nom = job.get("nom") if isinstance(job, dict) else None
+        ou = f"job {i} ({nom})" if nom else f"job {i}"
+        if not isinstance(job, dict):
+            problemes.append(f"{ou} : objet attendu")
+            continue
+        if not isinstance(nom, str) or not nom.strip():
+            problemes.append(f"{ou} : nom manquant")
+        elif os.path.isabs(nom) or "/" in nom or "\\" in nom or nom in (".", ".."):
+            # nom sert de dossier sous --sortie : ni chemin absolu, ni séparateur, ni ..
+            problemes.append(f"{ou} : nom invalide (ni chemin ni séparateur)")
+        reseaux = job.get("reseaux")
+        if reseaux is not None and (not isinstance(reseaux, list) or not all(isinstance(r, str) for r in reseaux)):
+            problemes.append(f"{ou} : reseaux attendu comme liste de noms")
+        debut, fin = _date_iso(job.get("debut")), _date_iso(job.get("fin"))
+        if debut is None or fin is None:
+            problemes.append(f"{ou} : debut et fin attendus au format AAAA-MM-JJ")
+        elif fin < debut:
+            problemes.append(f"{ou} : fin antérieure au début")
+        mode = job.get("reference", "precedente")
+        if mode not in REFERENCES.values():
+            problemes.append(f"{ou} : référence inconnue {mode!r}")
+        elif mode == "custom":
+            custom = job.get("reference_custom")
+            bornes = [_date_iso(d) for d in custom] if isinstance(custom, list) and len(custom) == 2 else [None]
+            if None in bornes:
+                problemes.append(f"{ou} : reference_custom attendu [debut, fin] au format AAAA-MM-JJ")
+            elif bornes[1] < bornes[0]:
+                problemes.append(f"{ou} : reference_custom de fin antérieure au début")
+    return problemes
+
+
+def _json(o):
+    if isinstance(o, (np.integer, np.floating)):
+        return o.item()
+    if isinstance(o, (date, pd.Timestamp)):
+        return o.isoformat()
+    raise TypeError(type(o).__name__)
+
+
+def _html(job, kpis, pics, figures, plotlyjs):
+    ref_s, ref_e = kpis['reference']
+    cartes = "".join(
+        f"<div class='kpi'><div class='t'>{html.escape(lib)}</div><div class='v'>{val}</div><div class='d'>{delta}</div></div>"
+        for lib, val, delta in [
+            ("Impressions", f"{kpis['Impressions'][0]:,}".replace(",", " "), f"{kpis['Impressions'][1]:+.1f}%"),
+            ("Portée", f"{kpis['Portee'][0]:,}".replace(",", " "), f"{kpis['Portee'][1]:+.1f}%"),
+            ("Engagements", f"{kpis['Engagements'][0]:,}".replace(",", " "), f"{kpis['Engagements'][1]:+.1f}%"),
+            ("Nouveaux Abonnés", f"{kpis['Nouveaux Abonnes'][0]:,}".replace(",", " "), f"{kpis['Nouveaux Abonnes'][1]:+.1f}%"),
+            ("Taux d'Engag.", f"{kpis['Taux'][0]:.2f}%", f"{kpis['Taux'][1]:+.2f} pts"),
+        ])
+    lignes_pics = "".join(
+        f"<li>{p['Date']:%d/%m/%Y} · {html.escape(str(p['Reseau']))} · {int(p['Engagements'])} Eng. (z {p['z']:.1f})</li>"
+        for _, p in pics.iterrows()) or "<li>Aucun pic inhabituel</li>"
+    # plotly.js inclus une seule fois (premier graphique)
+    graphes = "".join(
+        f"<h3>{html.escape(titre)}</h3>" + fig.to_html(full_html=False, include_plotlyjs=plotlyjs if i == 0 else False)
+        for i, (titre, fig) in enumerate(figures))
+    return f"""<!DOCTYPE html><html lang="fr"><head><meta charset="utf-8"><title>{html.escape(job['nom'])}</title>
+<style>body{{font-family:Poppins,sans-serif;background:#0f172a;color:#eee;margin:30px}}.kpis{{display:flex;gap:15px}}
+.kpi{{flex:1;background:rgba(255,255,255,.05);border-radius:16px;padding:15px}}.t{{color:#A0A0A0;font-size:12px}}
+.v{{font-size:26px;font-weight:700}}.d{{color:#FF7900}}</style></head><body>
+<h2>⚡ Orange Startup Studio Analytics — {html.escape(', '.join(map(str, job['reseaux'])))}</h2>
+<p>{job['debut']} → {job['fin']} · variations vs {ref_s:%d/%m/%Y} → {ref_e:%d/%m/%Y}</p>
+<div class="kpis">{cartes}</div><h3>⚡ Pics d'engagement</h3><ul>{lignes_pics}</ul>{graphes}</body></html>"""
+
+
+def executer(job, sortie, formats, plotlyjs="cdn"):
+    """Calcule et écrit un rapport ; renvoie (nom, secondes, fichiers écrits)."""
+    t0 = time.perf_counter()
+    index, moteur, indicateurs = _ETAT['index'], _ETAT['moteur'], _ETAT['indicateurs']
+    debut, fin = date.fromisoformat(job['debut']), date.fromisoformat(job['fin'])
+    reseaux = job.get('reseaux') or list(_ETAT['cube'].reseaux)
+    job = dict(job, reseaux=reseaux)
+    mode = job.get('reference', 'precedente')
+    custom = tuple(date.fromisoformat(d) for d in job['reference_custom']) if mode == "custom" else None
+    kpis = moteur.comparer(debut, fin, reseaux, mode, custom)
+    pics = indicateurs.pics(debut, fin, reseaux)
+    df_filt = index.selection(debut, fin, reseaux)
+    dossier = os.path.join(sortie, job['nom'])
+    os.makedirs(dossier, exist_ok=True)
+    fichiers = []
+    if "json" in formats:
+        chemin = os.path.join(dossier, "rapport.json")
+        with open(chemin, "w", encoding="utf-8") as f:
+            json.dump({"job": job, "lignes": len(df_filt), "kpis": kpis, "pics": pics.to_dict("records")}, f, ensure_ascii=False, indent=2, default=_json)
+        fichiers.append(chemin)
+    if df_filt.empty or not ({"html", "png"} & set(formats)):
+        return job['nom'], time.perf_counter() - t0, fichiers
+    superposition = indicateurs.agrege(debut, fin, reseaux)
+    figures = [
+        ("📈 Croissance de la Communauté", fig_cumul(indicateurs.audience(debut, fin, reseaux), COLORS, superposition=superposition)),
+        ("🍩 Répartition", fig_repartition(df_filt, COLORS)),
+        ("📊 Impressions", fig_impressions(df_filt, COLORS, superposition=superposition, pics=pics)),
+    ]
+    if "html" in formats:
+        chemin = os.path.join(dossier, "rapport.html")
+        with open(chemin, "w", encoding="utf-8") as f:
+            f.write(_html(job, kpis, pics, figures, plotlyjs))
+        fichiers.append(chemin)
+    if "png" in formats:
+        # Export statique via kaleido (dépendance optionnelle, vérifiée dans main)
+        for nom, (_, fig) in zip(("cumul", "repartition", "impressions"), figures):
+            chemin = os.path.join(dossier, f"{nom}.png")
+            fig.write_image(chemin, width=1200, height=600)
+            fichiers.append(chemin)
+    return job['nom'], time.perf_counter() - t0, fichiers
+
+
+def lancer(jobs, sortie, formats=FORMATS, workers=None, plotlyjs="cdn"):
+    """Exécute les jobs dans un pool de process ; le dataset doit être préparé (_preparer)."""
+    workers = workers or os.cpu_count() or 1
+    if "fork" in multiprocessing.get_all_start_methods():
+        return _executer_pool(jobs, sortie, formats, workers, plotlyjs, multiprocessing.get_context("fork"), None)
+    # Pas de fork : un Parquet lu en memory_map par chaque worker, supprimé en fin de lot
+    with tempfile.TemporaryDirectory(prefix="oss_batch_") as dossier:
+        parquet = os.path.join(dossier, "donnees.parquet")
+        sauver_parquet(_ETAT['df'], parquet, {"version": _ETAT['cube'].version})
+        return _executer_pool(jobs, sortie, formats, workers, plotlyjs, multiprocessing.get_context("spawn"), parquet)
+
+
+def _executer_pool(jobs, sortie, formats, workers, plotlyjs, ctx, parquet):
+    resultats = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(parquet, _ETAT['indicateurs'].bases)) as pool:
+        futurs = [pool.submit(executer, job, sortie, formats, plotlyjs) for job in jobs]
+        for futur in futurs:
+            nom, duree, fichiers = futur.result()
+            print(f"{duree * 1000:9.1f} ms  {nom}  ({len(fichiers)} fichiers)")
+            resultats.append((nom, duree, fichiers))
+    return resultats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", help="URL ou fichier CSV (défaut : sources.json)")
+    parser.add_argument("--abonnes", default=BASES_FILE, help="JSON des abonnés de départ par réseau (défaut : abonnes.json)")
+    parser.add_argument("--jobs", help="fichier JSON : liste de {nom, debut, fin, reseaux, reference}")
+    parser.add_argument("--mois", help="mois AAAA-MM séparés par des virgules (alternative à --jobs)")
+    parser.add_argument("--par-reseau", action="store_true", help="avec --mois : un rapport par réseau en plus du global")
+    parser.add_argument("--reference", choices=[m for m in REFERENCES.values() if m != "custom"], default="precedente")
+    parser.add_argument("--formats", default="html,json", help="parmi html,json,png (png : kaleido requis)")
+    parser.add_argument("--sortie", default="rapports")
+    parser.add_argument("--workers", type=int, default=None, help="défaut : nombre de cœurs")
+    parser.add_argument("--plotlyjs", choices=["cdn", "inline"], default="cdn", help="inline : HTML lisible hors ligne")
+    args = parser.parse_args()
+    formats = [f for f in args.formats.split(",") if f]
+    if set(formats) - set(FORMATS):
+        parser.error(f"formats inconnus : {sorted(set(formats) - set(FORMATS))}")
+    if "png" in formats and importlib.util.find_spec("kaleido") is None:
+        print("PNG ignoré : kaleido non installé (pip install kaleido)")
+        formats.remove("png")
+
+    t0 = time.perf_counter()
+    source = charger_source(args.source)
+    df = source.refresh()
+    _preparer(df, source.version, charger_bases(args.abonnes))
+    print(f"{len(df):,} lignes chargées en {time.perf_counter() - t0:.2f} s".replace(",", " "))
+
+    if args.jobs:
+        with open(args.jobs, encoding="utf-8") as f:
+            jobs = json.load(f)
+    elif args.mois:
+        jobs = jobs_mensuels(args.mois.split(","), list(_ETAT['cube'].reseaux), args.par_reseau)
+    else:
+        parser.error("--jobs ou --mois requis")
+    problemes = valider_jobs(jobs)
+    if problemes:
+        # Vérifié avant soumission : un job invalide arrêterait le lot en cours de route
+        parser.error("jobs invalides :\n  " + "\n  ".join(problemes))
+    if args.reference != "precedente":
+        jobs = [dict(j, reference=j.get("reference", args.reference)) for j in jobs]
+
+    t1 = time.perf_counter()
+    resultats = lancer(jobs, args.sortie, formats, args.workers, True if args.plotlyjs == "inline" else "cdn")
+    print(f"{len(resultats)} rapports en {time.perf_counter() - t1:.2f} s -> {args.sortie}")
+
+
+if __name__ == "__main__":
+    main()
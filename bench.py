@@ -0,0 +1,232 @@
+# Benchmarks hors Streamlit sur des données synthétiques.
+#   python bench.py pipeline --rows 1000,100000,1000000 --networks 4,50
+#   python bench.py assistant --rows 1000000 --networks 8
+#   python bench.py sessions --rows 1000000 --networks 4 --sessions 1,10,50
+#   python bench.py filtre --rows 1000000,5000000 --networks 4,50
+import argparse
+import gc
+import json
+import multiprocessing
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import reporting
+from analytics import IndicateursGlissants
+from schema import METRIQUES
+
+QUESTIONS = [
+    "impressions LinkedIn en octobre",
+    "meilleur jour Instagram semaine dernière",
+    "engagements X 2024",
+    "taux d'engagement ce mois",
+    "abonnés facebook les 30 derniers jours",
+    "portée",
+]
+
+
+def donnees_synthetiques(n_lignes, n_reseaux=4, debut="2020-01-01", seed=0):
+    """Frame au schéma de load_data() : une ligne par (jour, réseau), jours consécutifs."""
+    rng = np.random.default_rng(seed)
+    noms = ["LinkedIn", "Instagram", "Facebook", "X"] + [f"Reseau{i}" for i in range(4, n_reseaux)]
+    noms = noms[:n_reseaux]
+    jours = pd.date_range(debut, periods=-(-n_lignes // n_reseaux), freq="D")
+    df = pd.DataFrame({
+        'Date': np.repeat(jours.values, n_reseaux)[:n_lignes],
+        'Reseau': pd.Categorical(np.tile(noms, len(jours))[:n_lignes], categories=noms),
+    })
+    for c in METRIQUES:
+        df[c] = rng.integers(0, 5000, n_lignes, dtype=np.int32)
+    return df
+
+
+def csv_synthetique(df):
+    """Octets CSV au format de la Google Sheet (dates jj/mm/aaaa)."""
+    return df.to_csv(index=False, date_format='%d/%m/%Y').encode('utf-8')
+
+
+def _chrono(fn, repetitions=1):
+    t0 = time.perf_counter()
+    for _ in range(repetitions):
+        res = fn()
+    return (time.perf_counter() - t0) / repetitions, res
+
+
+def _pic_memoire(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def etapes(df, csv=None):
+    """(nom, callable) de chaque étape du dashboard, sur une sélection des 90 derniers jours."""
+    fin = df['Date'].max().date()
+    debut = fin - pd.Timedelta(days=89)
+    choix = list(df['Reseau'].cat.categories if hasattr(df['Reseau'], 'cat') else df['Reseau'].unique())
+    cube = reporting.construire_cube(df)
+    index = reporting.construire_index(df)
+    df_filt = index.selection(debut, fin, choix)
+    res = []
+    if csv is not None:
+        res.append(("charger_csv", lambda: reporting.charger_csv(csv)))
+    res += [
+        ("filtrer", lambda: reporting.filtrer(df, debut, fin, choix)),
+        ("construire_index", lambda: reporting.construire_index(df)),
+        ("index.selection", lambda: index.selection(debut, fin, choix)),
+        ("kpis (scan)", lambda: reporting.kpis(df, debut, fin, choix)),
+        ("construire_cube", lambda: reporting.construire_cube(df)),
+        ("cube.kpis", lambda: cube.kpis(debut, fin, choix)),
+        ("top3", lambda: reporting.top3(df_filt)),
+        ("cumul_abonnes", lambda: reporting.cumul_abonnes(df_filt)),
+        ("par_periode (frame)", lambda: reporting.par_periode(df_filt)),
+        ("cube.par_periode", lambda: cube.par_periode(debut, fin, choix)),
+        ("repondre", lambda: reporting.repondre(QUESTIONS[0], cube, debut, fin, choix, fin)),
+    ]
+    return res
+
+
+def bench_pipeline(tailles, reseaux, max_csv=2_000_000, memoire=True, sortie=None):
+    for n_reseaux in reseaux:
+        for n in tailles:
+            df = donnees_synthetiques(n, n_reseaux)
+            csv = csv_synthetique(df) if n <= max_csv else None
+            for nom, fn in etapes(df, csv):
+                duree, _ = _chrono(fn)
+                pic = _pic_memoire(fn) if memoire else None
+                ligne = {"lignes": n, "reseaux": n_reseaux, "etape": nom, "ms": round(duree * 1000, 3), "pic_octets": pic}
+                pic_txt = f"{pic / 2**20:8.1f} Mo" if pic is not None else ""
+                print(f"{n:>10,} {n_reseaux:>3} {nom:<22} {duree * 1000:10.2f} ms {pic_txt}")
+                if sortie:
+                    sortie.write(json.dumps(ligne) + "\n")
+
+
+def _rss():
+    """RSS courant du process en octets (/proc sous Linux, sinon pic via getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _session(index, cube, indicateurs, debut, fin, choix):
+    # Frames qu'une session garde en vie pendant un rerun (mêmes appels que le dashboard)
+    return index.selection(debut, fin, choix), indicateurs.audience(debut, fin, choix), cube.par_periode(debut, fin, choix)
+
+
+def _mesure_sessions(n_lignes, n_reseaux, n_sessions, partage, jours=90):
+    df = donnees_synthetiques(n_lignes, n_reseaux)
+    fin = df['Date'].max().date()
+    debut = fin - pd.Timedelta(days=jours - 1)
+    choix = list(df['Reseau'].cat.categories)
+    gc.collect()
+    avant = _rss()
+    # Instantané (rafraichissement.py) : index, cube et indicateurs construits une fois, comptés dans la mesure
+    index = reporting.construire_index(df)
+    cube = reporting.construire_cube(df)
+    indicateurs = IndicateursGlissants.depuis_frame(df)
+    # Une session = un thread, comme les reruns Streamlit ; copie du frame (et de son index) par session
+    # si non partagé (st.cache_data)
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        gardes = list(ex.map(lambda _: _session(index if partage else reporting.construire_index(df.copy()), cube, indicateurs, debut, fin, choix), range(n_sessions)))
+    gc.collect()
+    return _rss() - avant, len(gardes)
+
+
+def bench_sessions(tailles, reseaux, sessions, sortie=None):
+    # Un process neuf par mesure : la RSS n'est pas faussée par la mémoire libérée d'une mesure précédente
+    ctx = multiprocessing.get_context("spawn")
+    for n_reseaux in reseaux:
+        for n in tailles:
+            for n_sessions in sessions:
+                for partage in (True, False):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+                        delta, _ = ex.submit(_mesure_sessions, n, n_reseaux, n_sessions, partage).result()
+                    mode = "partagé" if partage else "copie"
+                    print(f"{n:>10,} {n_reseaux:>3} {n_sessions:>4} sessions {mode:<8} +{delta / 2**20:8.1f} Mo RSS ({delta / n_sessions / 2**20:6.2f} Mo/session)")
+                    if sortie:
+                        sortie.write(json.dumps({"lignes": n, "reseaux": n_reseaux, "sessions": n_sessions, "partage": partage, "rss_octets": delta}) + "\n")
+
+
+def _filtrer_dt_date(df, debut, fin, reseaux):
+    # Chemin historique du dashboard : .dt.date (un objet date par ligne) puis tri
+    jours = df['Date'].dt.date
+    return df.loc[(jours >= debut) & (jours <= fin) & df['Reseau'].isin(reseaux)].sort_values(by='Date')
+
+
+def bench_filtre(tailles, reseaux, jours=90, repetitions=20, sortie=None):
+    """Sélection période x réseaux : masque .dt.date, masque datetime64, searchsorted trié."""
+    for n_reseaux in reseaux:
+        for n in tailles:
+            # Lignes mélangées : le frame source n'est pas supposé trié
+            df = donnees_synthetiques(n, n_reseaux).sample(frac=1, random_state=0)
+            fin = df['Date'].max().date()
+            debut = fin - pd.Timedelta(days=jours - 1)
+            tous = list(df['Reseau'].cat.categories)
+            duree_index, index = _chrono(lambda: reporting.construire_index(df))
+            # Positions + dates triées, le frame lui-même n'est pas recopié
+            octets = index.ordre.nbytes + index.dates.nbytes
+            print(f"{n:>10,} {n_reseaux:>3} construire_index (une fois par version) {duree_index * 1000:10.2f} ms, {octets / 2**20:.1f} Mo")
+            for libelle, choix in (("tous", tous), ("1 réseau", tous[:1])):
+                attendu = len(index.selection(debut, fin, choix))
+                for nom, fn, rep in (
+                    (".dt.date + tri", lambda: _filtrer_dt_date(df, debut, fin, choix), max(1, repetitions // 10)),
+                    ("masque datetime64", lambda: reporting.filtrer(df, debut, fin, choix), repetitions),
+                    ("index.selection", lambda: index.selection(debut, fin, choix), repetitions * 10),
+                ):
+                    duree, res = _chrono(fn, rep)
+                    assert len(res) == attendu, (nom, len(res), attendu)
+                    print(f"{n:>10,} {n_reseaux:>3} {libelle:<9} {nom:<20} {duree * 1000:10.3f} ms")
+                    if sortie:
+                        sortie.write(json.dumps({"lignes": n, "reseaux": n_reseaux, "selection": libelle, "methode": nom, "ms": duree * 1000}) + "\n")
+
+
+def bench_assistant(df, repetitions=200):
+    duree_cube, cube = _chrono(lambda: reporting.construire_cube(df))
+    debut, fin = df['Date'].min().date(), df['Date'].max().date()
+    choix = list(cube.reseaux)
+    print(f"cube : {duree_cube * 1000:.1f} ms pour {len(df):,} lignes")
+    for q in QUESTIONS:
+        duree, reponse = _chrono(lambda: reporting.repondre(q, cube, debut, fin, choix, fin), repetitions)
+        print(f"{duree * 1e6:9.1f} µs  {q!r} -> {reponse}")
+
+
+def _entiers(texte):
+    return [int(x) for x in texte.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("suite", choices=["pipeline", "assistant", "sessions", "filtre"])
+    parser.add_argument("--rows", type=_entiers, default=[1_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--networks", type=_entiers, default=[4, 50])
+    parser.add_argument("--sessions", type=_entiers, default=[1, 10, 50], help="nombre de sessions simulées (suite sessions)")
+    parser.add_argument("--max-csv-rows", type=int, default=2_000_000, help="au-delà, l'étape charger_csv est sautée")
+    parser.add_argument("--no-memory", action="store_true", help="ne pas mesurer le pic mémoire (tracemalloc)")
+    parser.add_argument("--json", help="fichier JSON lines de résultats")
+    args = parser.parse_args()
+    if args.suite == "assistant":
+        bench_assistant(donnees_synthetiques(args.rows[-1], args.networks[-1]))
+        return
+    sortie = open(args.json, "w", encoding="utf-8") if args.json else None
+    try:
+        if args.suite == "sessions":
+            bench_sessions(args.rows, args.networks, args.sessions, sortie)
+        elif args.suite == "filtre":
+            bench_filtre(args.rows, args.networks, sortie=sortie)
+        else:
+            bench_pipeline(args.rows, args.networks, args.max_csv_rows, not args.no_memory, sortie)
+    finally:
+        if sortie:
+            sortie.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Comparaison de périodes : période courante vs une référence au choix
+# (période précédente, année précédente, mois précédent, dates personnalisées).
+# Les deux périodes sont lues ensemble dans le cube, et le résultat est mis en cache.
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+# libellé affiché -> mode
+REFERENCES = {
+    "Période précédente": "precedente",
+    "Année précédente": "annee",
+    "Mois précédent": "mois",
+    "Personnalisée": "custom",
+}
+
+
+def fin_mois(annee, mois):
+    """Dernier jour du mois (mois de 1 à 12)."""
+    return date(annee + mois // 12, mois % 12 + 1, 1) - timedelta(days=1)
+
+
+def _decaler_mois(d, mois):
+    m = d.month - 1 + mois
+    annee, m = d.year + m // 12, m % 12 + 1
+    # Jour borné à la fin du mois (31 mars -> 28/29 février)
+    return date(annee, m, min(d.day, fin_mois(annee, m).day))
+
+
+def periode_reference(debut, fin, mode="precedente", custom=None):
+    if mode == "precedente":
+        duree = (fin - debut).days
+        return debut - timedelta(days=duree + 1), debut - timedelta(days=1)
+    if mode == "annee":
+        return _decaler_mois(debut, -12), _decaler_mois(fin, -12)
+    if mode == "mois":
+        return _decaler_mois(debut, -1), _decaler_mois(fin, -1)
+    if mode == "custom":
+        if not custom:
+            raise ValueError("Période de référence personnalisée manquante")
+        return custom
+    raise ValueError(f"Mode de comparaison inconnu : {mode}")
+
+
+class MoteurComparaison:
+    """KPIs courant + référence depuis un RollupCube, cachés par (période, référence, réseaux)."""
+
+    def __init__(self, cube, max_entries=256):
+        self.cube = cube
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def comparer(self, debut, fin, reseaux, mode="precedente", custom=None):
+        ref = periode_reference(debut, fin, mode, custom)
+        cle = (debut, fin, ref, tuple(sorted(reseaux)))
+        with self._lock:
+            if cle in self._cache:
+                self._cache.move_to_end(cle)
+                return self._cache[cle]
+        res = self.cube.kpis_vs(debut, fin, ref[0], ref[1], reseaux)
+        res['reference'] = ref
+        with self._lock:
+            self._cache[cle] = res
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return res
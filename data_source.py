@@ -0,0 +1,368 @@
+# Source de données : Google Sheet publié en CSV, avec snapshot local.
+# - Revalidation conditionnelle (ETag / Last-Modified) + empreinte SHA-256
+# - Si le CSV n'a fait que s'allonger (préfixe vérifié par SHA-256, octets non conservés),
+#   seules les nouvelles lignes sont parsées
+# - Snapshot sur disque partagé entre les process Streamlit
+# - Frame nettoyé persisté en Parquet (démarrage à chaud sans re-parser le CSV)
+# - Registre de sources (URL ou fichiers locaux) chargées en parallèle
+# - Schéma compact (cf. schema.py) avec comptage des lignes invalides
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import compter, etape
+from schema import appliquer_schema, concat_types, fusionner_rapports, nouveau_rapport
+
+mes_colonnes = ['Date', 'Reseau', 'Impressions', 'Portee', 'Engagements', 'Reactions', 'Interactions', 'Nouveaux Abonnes']
+
+# A incrémenter dès que nettoyer() change : les caches Parquet existants sont alors ignorés
+SCHEMA_VERSION = 4
+PARQUET_META_KEY = b"oss_cache"
+
+CACHE_DIR = os.environ.get("OSS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+
+def nettoyer(df, rapport=None):
+    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce')
+    df, _ = appliquer_schema(df, rapport)
+    return df
+
+
+def _nb_lignes(data, header):
+    # Lignes non vides (approximation : pas de retour à la ligne dans les cellules)
+    n = data.count(b"\n") + (0 if data.endswith(b"\n") else 1)
+    n -= data.count(b"\n\n") + data.count(b"\n\r\n") + (1 if data.startswith((b"\n", b"\r\n")) else 0)
+    return max(n - (1 if header else 0), 0)
+
+
+def parser_csv(data, header=True, colonnes=None, entete=None, reseau=None, rapport=None):
+    """colonnes : {nom dans la source: nom dans mes_colonnes} ; sinon les 8 premières colonnes dans l'ordre."""
+    rapport = rapport if rapport is not None else nouveau_rapport()
+    if not data.strip():
+        return nettoyer(pd.DataFrame(columns=mes_colonnes), rapport)
+    if colonnes:
+        df = pd.read_csv(io.BytesIO(data), header=None, skiprows=1 if header else 0, names=entete, usecols=list(colonnes), on_bad_lines='skip')
+        df = df.rename(columns=colonnes)
+    else:
+        df = pd.read_csv(io.BytesIO(data), header=0 if header else None, names=mes_colonnes, usecols=range(8), on_bad_lines='skip')
+    if reseau:
+        df['Reseau'] = reseau
+    # on_bad_lines='skip' ne dit rien : on compte l'écart avec le nombre de lignes du CSV
+    rapport["lignes_lues"] += len(df)
+    rapport["lignes_malformees"] += max(_nb_lignes(data, header) - len(df), 0)
+    return nettoyer(df.reindex(columns=mes_colonnes), rapport)
+
+
+def lire_entete(data):
+    premiere = data.split(b"\n", 1)[0].decode("utf-8-sig").rstrip("\r")
+    return next(csv.reader([premiere]), [])
+
+
+def _fin_derniere_ligne(data):
+    # Offset juste après le dernier saut de ligne : tout ce qui précède est "figé"
+    return data.rfind(b"\n") + 1
+
+
+def _empreinte(data, fin):
+    # SHA-256 des octets [0, fin) sans copier la tranche
+    return hashlib.sha256(memoryview(data)[:fin]).hexdigest()
+
+
+def _ecrire_atomique(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def sauver_parquet(df, path, infos):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[PARQUET_META_KEY] = json.dumps(dict(infos, schema_version=SCHEMA_VERSION)).encode("utf-8")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table.replace_schema_metadata(meta), tmp)
+    os.replace(tmp, path)
+
+
+def lire_parquet(path):
+    # memory_map : les colonnes sont lues depuis le page cache, partagé entre process
+    table = pq.read_table(path, memory_map=True)
+    infos = json.loads((table.schema.metadata or {}).get(PARQUET_META_KEY, b"{}"))
+    if infos.get("schema_version") != SCHEMA_VERSION:
+        return None, infos
+    return table.to_pandas(), infos
+
+
+class SheetSource:
+    """CSV (URL ou fichier local) revalidé à la demande ; un seul objet par process (partagé entre sessions)."""
+
+    def __init__(self, url, cache_dir=CACHE_DIR, timeout=30, retries=2, colonnes=None, reseau=None, nom=None):
+        self.url = url
+        self.nom = nom or url
+        self.timeout = timeout
+        self.retries = retries
+        self.colonnes = colonnes
+        self.reseau = reseau
+        self.cache_dir = cache_dir
+        # Le mapping fait partie de la clé : changer la config invalide snapshot et Parquet
+        config = json.dumps([url, colonnes, reseau], sort_keys=True)
+        cle = hashlib.sha1(config.encode("utf-8")).hexdigest()[:16]
+        self.snapshot_path = os.path.join(cache_dir, f"{cle}.csv")
+        self.meta_path = os.path.join(cache_dir, f"{cle}.json")
+        self.parquet_path = os.path.join(cache_dir, f"{cle}.parquet")
+        self._lock = threading.Lock()
+        self._offset = 0        # fin de la dernière ligne complète du dernier CSV reçu
+        self._prefixe = None    # SHA-256 des octets [0, _offset) : détection d'un simple ajout
+        self._df = None         # frame complète : lignes complètes puis éventuelle ligne partielle
+        self._n_base = 0        # nombre de lignes complètes en tête de _df (persistées en Parquet)
+        self._entete = None     # noms de colonnes de la source (si mapping)
+        self.rapport = nouveau_rapport()  # validation des lignes complètes
+        self._base_modifiee = False
+        self.meta = {}
+        self.stats = {"requetes": 0, "non_modifie": 0, "ajout": 0, "complet": 0}
+
+    @property
+    def version(self):
+        return self.meta.get("sha256")
+
+    @property
+    def recupere(self):
+        return self.meta.get("recupere")
+
+    @property
+    def est_local(self):
+        return not self.url.startswith(("http://", "https://"))
+
+    def _parser(self, data, header=True, rapport=None):
+        return parser_csv(data, header, self.colonnes, self._entete, self.reseau, rapport)
+
+    # --- Snapshot disque ---
+    def _charger_snapshot(self):
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                body = f.read()
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if hashlib.sha256(body).hexdigest() != meta.get("sha256"):
+            return False
+        self.meta = meta
+        if not self._charger_parquet(body):
+            self._remplacer(body)
+        return True
+
+    def _charger_parquet(self, body):
+        # Le Parquet n'est valable que s'il correspond exactement aux lignes complètes du snapshot
+        try:
+            base, infos = lire_parquet(self.parquet_path)
+        except (OSError, ValueError, pa.ArrowException):
+            return False
+        offset = _fin_derniere_ligne(body)
+        if base is None or infos.get("offset") != offset or infos.get("prefix_sha256") != _empreinte(body, offset):
+            return False
+        self._offset = offset
+        self._prefixe = infos["prefix_sha256"]
+        self._entete = lire_entete(body)
+        self.rapport = dict(nouveau_rapport(), **infos.get("rapport", {}))
+        self._base_modifiee = False
+        self._poser([base], body[offset:])
+        return True
+
+    def _sauver_snapshot(self, body):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _ecrire_atomique(self.snapshot_path, body)
+        _ecrire_atomique(self.meta_path, json.dumps(self.meta).encode("utf-8"))
+        if self._base_modifiee:
+            sauver_parquet(self._df.iloc[:self._n_base], self.parquet_path,
+                           {"offset": self._offset, "prefix_sha256": self._prefixe, "rapport": self.rapport})
+            self._base_modifiee = False
+
+    # --- Mise à jour du frame ---
+    def _remplacer(self, body):
+        self._offset = _fin_derniere_ligne(body)
+        self._prefixe = _empreinte(body, self._offset)
+        self._entete = lire_entete(body)
+        self.rapport = nouveau_rapport()
+        base = self._parser(body[:self._offset], rapport=self.rapport)
+        self._base_modifiee = True
+        self._poser([base], body[self._offset:])
+
+    def _ajouter(self, body):
+        # Le CSV précédent est un préfixe du nouveau : on ne parse que la suite
+        morceaux = [self._df.iloc[:self._n_base]]
+        nouveau_offset = _fin_derniere_ligne(body)
+        if nouveau_offset > self._offset:
+            nouvelles = self._parser(body[self._offset:nouveau_offset], header=False, rapport=self.rapport)
+            if not nouvelles.empty:
+                morceaux.append(nouvelles)
+                self._base_modifiee = True
+            self._offset = nouveau_offset
+            self._prefixe = _empreinte(body, nouveau_offset)
+        self._poser(morceaux, body[self._offset:])
+
+    def _poser(self, morceaux, reste):
+        # Lignes complètes et ligne partielle assemblées en une seule copie (aucune si rien ne change)
+        n_base = sum(len(m) for m in morceaux)
+        if reste.strip():
+            # Ligne sans saut de ligne final : re-parsée au prochain ajout, donc hors rapport.
+            # Tronquée (moins de colonnes que prévu), elle est ignorée jusqu'à ce qu'elle soit complète.
+            try:
+                morceaux = morceaux + [self._parser(reste, header=self._offset == 0)]
+            except ValueError:
+                pass
+        self._df = concat_types(morceaux)
+        self._n_base = n_base
+
+    # --- Réseau ---
+    def _lire_local(self):
+        path = self.url[len("file://"):] if self.url.startswith("file://") else self.url
+        st_ = os.stat(path)
+        etag = f"{st_.st_mtime_ns}-{st_.st_size}"
+        if self._df is not None and etag == self.meta.get("etag"):
+            return None, {"ETag": etag}
+        with open(path, "rb") as f:
+            return f.read(), {"ETag": etag}
+
+    def _telecharger(self):
+        if self.est_local:
+            return self._lire_local()
+        req = urllib.request.Request(self.url)
+        if self._df is not None:
+            if self.meta.get("etag"):
+                req.add_header("If-None-Match", self.meta["etag"])
+            if self.meta.get("last_modified"):
+                req.add_header("If-Modified-Since", self.meta["last_modified"])
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.read(), resp.headers
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None, e.headers
+            raise
+
+    def _telecharger_avec_retries(self):
+        for essai in range(self.retries + 1):
+            try:
+                return self._telecharger()
+            except (urllib.error.URLError, OSError) as e:
+                # Erreur client (404, 403...) : inutile de réessayer
+                if essai == self.retries or (isinstance(e, urllib.error.HTTPError) and e.code < 500):
+                    raise
+                time.sleep(0.5 * 2 ** essai)
+
+    def charger_cache(self):
+        """Frame du snapshot disque, sans accès réseau (None si absent ou invalide)."""
+        with self._lock:
+            if self._df is None:
+                self._charger_snapshot()
+            return self._df
+
+    def refresh(self):
+        """Revalide le CSV et renvoie le frame nettoyé (ne pas modifier : partagé)."""
+        with self._lock:
+            if self._df is None:
+                self._charger_snapshot()
+            self.stats["requetes"] += 1
+            with etape("source.telechargement"):
+                body, headers = self._telecharger_avec_retries()
+            if body is None:
+                self.stats["non_modifie"] += 1
+                compter("source", "non_modifie")
+                return self._df
+            sha = hashlib.sha256(body).hexdigest()
+            if self._df is not None and sha == self.meta.get("sha256"):
+                resultat = "non_modifie"
+            elif self._df is not None and 0 < self._offset <= len(body) and _empreinte(body, self._offset) == self._prefixe:
+                resultat = "ajout"
+                with etape("source.parse_ajout"):
+                    self._ajouter(body)
+            else:
+                resultat = "complet"
+                with etape("source.parse_complet"):
+                    self._remplacer(body)
+            self.stats[resultat] += 1
+            compter("source", resultat)
+            self.meta = {"sha256": sha, "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified"), "recupere": time.time()}
+            try:
+                self._sauver_snapshot(body)
+            except (OSError, pa.ArrowException):
+                pass  # Disque en lecture seule : on garde le snapshot en mémoire
+            return self._df
+
+
+class SourceRegistry:
+    """Plusieurs sources fusionnées dans un seul frame ; rafraîchies en parallèle."""
+
+    def __init__(self, sources, max_workers=8):
+        self.sources = sources
+        self.max_workers = max_workers
+        self.erreurs = {}
+        self._cle = None
+        self._df = None
+
+    @property
+    def rapport(self):
+        return fusionner_rapports(s.rapport for s in self.sources)
+
+    @classmethod
+    def depuis_config(cls, config, cache_dir=CACHE_DIR):
+        # config : liste de dicts {"url", "nom", "colonnes", "reseau", "timeout", "retries"}
+        return cls([SheetSource(cache_dir=cache_dir, **c) for c in config])
+
+    @classmethod
+    def depuis_fichier(cls, path, cache_dir=CACHE_DIR):
+        with open(path, encoding="utf-8") as f:
+            return cls.depuis_config(json.load(f), cache_dir)
+
+    @property
+    def version(self):
+        versions = [s.version or "" for s in self.sources]
+        return hashlib.sha256("|".join(versions).encode("utf-8")).hexdigest()
+
+    @property
+    def recupere(self):
+        """Horodatage du plus ancien contenu téléchargé parmi les sources (None si inconnu)."""
+        dates = [s.recupere for s in self.sources if s._df is not None]
+        return min(dates) if dates and None not in dates else None
+
+    def charger_cache(self):
+        """Frame fusionné des snapshots disque, sans accès réseau (None si aucun)."""
+        frames = [s.charger_cache() for s in self.sources]
+        if all(f is None for f in frames):
+            return None
+        self._df = concat_types(frames)
+        self._cle = tuple(s.version if f is not None else None for s, f in zip(self.sources, frames))
+        return self._df
+
+    def _refresh_un(self, source):
+        try:
+            return source.refresh(), None
+        except Exception as e:
+            # Source en échec : on garde son dernier frame connu s'il existe
+            return source._df, e
+
+    def refresh(self):
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.sources))) as pool:
+            resultats = list(pool.map(self._refresh_un, self.sources))
+        self.erreurs = {s.nom: str(e) for s, (_, e) in zip(self.sources, resultats) if e is not None}
+        frames = [df for df, _ in resultats if df is not None]
+        if not frames:
+            raise RuntimeError("; ".join(f"{nom}: {err}" for nom, err in self.erreurs.items()))
+        cle = tuple(s.version if df is not None else None for s, (df, _) in zip(self.sources, resultats))
+        if cle != self._cle:
+            # Fusion uniquement si au moins une source a changé
+            self._df = concat_types(frames)
+            self._cle = cle
+        return self._df
@@ -0,0 +1,54 @@
+# Export des données filtrées : généré uniquement au clic, écrit par blocs.
+# Formats : CSV, CSV gzip, Parquet.
+import gzip
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CHUNK_ROWS = 50_000
+
+# libellé -> (extension, type MIME)
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def iter_csv(df, chunk_rows=CHUNK_ROWS):
+    """Blocs d'octets CSV (UTF-8), en-tête dans le premier bloc."""
+    if df.empty:
+        yield df.to_csv(index=False).encode('utf-8')
+        return
+    for i in range(0, len(df), chunk_rows):
+        yield df.iloc[i:i + chunk_rows].to_csv(index=False, header=(i == 0)).encode('utf-8')
+
+
+def ecrire_csv(df, fichier, compresse=False, chunk_rows=CHUNK_ROWS):
+    out = gzip.GzipFile(fileobj=fichier, mode="wb", mtime=0) if compresse else fichier
+    for bloc in iter_csv(df, chunk_rows):
+        out.write(bloc)
+    if compresse:
+        out.close()
+
+
+def ecrire_parquet(df, fichier, chunk_rows=CHUNK_ROWS):
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(fichier, schema) as writer:
+        for i in range(0, max(len(df), 1), chunk_rows):
+            writer.write_table(pa.Table.from_pandas(df.iloc[i:i + chunk_rows], schema=schema, preserve_index=False))
+
+
+def exporter(df, fmt="CSV", chunk_rows=CHUNK_ROWS):
+    buf = io.BytesIO()
+    if fmt == "Parquet":
+        ecrire_parquet(df, buf, chunk_rows)
+    else:
+        ecrire_csv(df, buf, compresse=(fmt == "CSV (gzip)"), chunk_rows=chunk_rows)
+    buf.seek(0)
+    return buf
+
+
+def nom_fichier(fmt, base="reporting_oss"):
+    return f"{base}.{FORMATS[fmt][0]}"
@@ -0,0 +1,183 @@
+# Construction des graphiques Plotly + cache LRU partagé entre les sessions.
+# Clé : (version des données, début, fin, réseaux, nom du graphique).
+# Les séries temporelles sont réduites côté serveur sur les longues périodes.
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from instrumentation import compter
+
+# Couleurs des réseaux (dashboard et rapports batch)
+COLORS = {"LinkedIn": "#0077B5", "Instagram": "#E1306C", "Facebook": "#1877F2", "X": "#FFFFFF"}
+
+# Nombre maximal de points envoyés au navigateur par réseau et par courbe
+MAX_POINTS = 365
+# (libellé, fréquence pandas, jours par point)
+RESOLUTIONS = [("Jour", "D", 1), ("Semaine", "W", 7), ("Mois", "MS", 31)]
+
+
+def make_chart_transparent(fig):
+    fig.update_layout(template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(family="Poppins", color="#E0E0E0"), margin=dict(l=0, r=0, t=40, b=0), hovermode="x unified")
+    fig.update_xaxes(showgrid=False, showline=False)
+    fig.update_yaxes(showgrid=True, gridcolor='rgba(255,255,255,0.05)', zeroline=False)
+    return fig
+
+
+def choisir_resolution(nb_jours, max_points=MAX_POINTS):
+    for libelle, freq, pas in RESOLUTIONS:
+        if nb_jours / pas <= max_points:
+            return libelle, freq
+    return RESOLUTIONS[-1][:2]
+
+
+def serie_par_reseau(df, col, freq="D", agg="sum"):
+    return df.groupby(['Reseau', pd.Grouper(key='Date', freq=freq)], observed=True)[col].agg(agg).reset_index()
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets : indices des points conservés (premier et dernier inclus)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    bords = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for k in range(n_out - 2):
+        debut, fin = bords[k], bords[k + 1]
+        # Moyenne du bucket suivant (ou dernier point)
+        suiv_fin = bords[k + 2] if k + 2 < len(bords) else n
+        cx, cy = x[fin:suiv_fin].mean(), y[fin:suiv_fin].mean()
+        aires = np.abs((x[a] - cx) * (y[debut:fin] - y[a]) - (x[a] - x[debut:fin]) * (cy - y[a]))
+        a = debut + int(np.argmax(aires))
+        idx[k + 1] = a
+    return idx
+
+
+def reduire_lttb(serie, col, max_points=MAX_POINTS):
+    morceaux = []
+    for _, bloc in serie.groupby('Reseau', sort=False, observed=True):
+        garde = lttb(bloc['Date'].values.astype('datetime64[ns]').astype(np.int64), bloc[col].values, max_points)
+        morceaux.append(bloc.iloc[garde])
+    return pd.concat(morceaux) if morceaux else serie
+
+
+def _titre(resolution):
+    return dict(text=f"Résolution : {resolution}", font=dict(size=12, color="#A0A0A0"), x=0)
+
+
+def _axe_secondaire(fig, x, y, nom, suffixe=""):
+    # Courbe pointillée sur un axe y à droite (indicateurs glissants)
+    fig.add_trace(go.Scatter(x=x, y=y, name=nom, yaxis="y2", mode="lines", line=dict(color="#FF7900", width=2, dash="dot")))
+    fig.update_layout(yaxis2=dict(overlaying="y", side="right", showgrid=False, zeroline=False, ticksuffix=suffixe))
+
+
+def _reduire_superposition(superposition, col, freq, max_points):
+    s = superposition[['Date', col]]
+    if freq != "D":
+        return s.resample(freq, on='Date').last().reset_index()
+    if len(s) > max_points:
+        return s.iloc[lttb(s['Date'].values.astype('datetime64[ns]').astype(np.int64), s[col].values, max_points)]
+    return s
+
+
+def fig_cumul(audience, colors, max_points=MAX_POINTS, superposition=None):
+    """Audience absolue par réseau (frame Date / Reseau / Audience, cf. IndicateursGlissants.audience)."""
+    nb_jours = (audience['Date'].max() - audience['Date'].min()).days + 1 if len(audience) else 0
+    resolution, freq = choisir_resolution(nb_jours, max_points)
+    if freq != "D":
+        # Audience en fin de semaine / mois
+        audience = serie_par_reseau(audience, 'Audience', freq, "last")
+    fig = px.area(audience, x='Date', y='Audience', color='Reseau', color_discrete_map=colors)
+    fig.update_traces(line_shape='spline' if freq == "D" else 'linear', fill='tozeroy')
+    fig.update_layout(title=_titre(resolution))
+    make_chart_transparent(fig)
+    if superposition is not None and len(superposition):
+        s = _reduire_superposition(superposition, 'Abonnes moy. 7j', freq, max_points)
+        _axe_secondaire(fig, s['Date'], s['Abonnes moy. 7j'], "Nouveaux abonnés (moy. 7j)")
+    return fig
+
+
+def fig_repartition(df_filt, colors):
+    fig = px.pie(df_filt, values='Impressions', names='Reseau', color='Reseau', color_discrete_map=colors, hole=0.7)
+    fig.update_traces(textinfo='percent', textfont_size=14, marker=dict(line=dict(color='#000000', width=2)))
+    return make_chart_transparent(fig)
+
+
+def fig_impressions(df_filt, colors, max_points=MAX_POINTS, superposition=None, pics=None):
+    serie = serie_par_reseau(df_filt, 'Impressions')
+    points = serie.groupby('Reseau', observed=True).size().max()
+    if points > max_points:
+        # LTTB : garde les pics d'impressions, contrairement à une moyenne par semaine
+        serie = reduire_lttb(serie, 'Impressions', max_points)
+        resolution, forme = f"Jour (LTTB, {max_points} pts/réseau)", 'linear'
+    else:
+        resolution, forme = "Jour", 'spline'
+    fig = px.line(serie, x='Date', y='Impressions', color='Reseau', color_discrete_map=colors)
+    fig.update_traces(line_shape=forme, line_width=4)
+    fig.update_layout(title=_titre(resolution))
+    make_chart_transparent(fig)
+    if superposition is not None and len(superposition):
+        s = _reduire_superposition(superposition, 'Taux 28j', "D", max_points)
+        _axe_secondaire(fig, s['Date'], s['Taux 28j'], "Taux d'engagement 28j", " %")
+    if pics is not None:
+        # Pics d'engagement (z-score) : repères verticaux
+        for _, p in pics.iterrows():
+            fig.add_vline(x=p['Date'], line=dict(color=colors.get(p['Reseau'], "#FF7900"), width=1, dash="dash"),
+                          annotation_text=f"z {p['z']:.1f}", annotation_font_size=10)
+    return fig
+
+
+def taille_figure(fig):
+    # Estimation de l'empreinte mémoire : somme des tableaux de données des traces
+    total = 0
+    for trace in fig.data:
+        for champ in ("x", "y", "values", "labels", "customdata"):
+            v = getattr(trace, champ, None)
+            if v is not None:
+                total += np.asarray(v).nbytes
+    return total
+
+
+class FigureCache:
+    """LRU borné en nombre d'entrées et en octets ; les figures ne doivent pas être modifiées."""
+
+    def __init__(self, max_entries=64, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, builder):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                compter("cache_figures", "hit")
+                return self._items[key][0]
+            self.misses += 1
+            compter("cache_figures", "miss")
+        fig = builder()
+        taille = taille_figure(fig)
+        with self._lock:
+            if key not in self._items and taille <= self.max_bytes:
+                self._items[key] = (fig, taille)
+                self._bytes += taille
+                while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                    _, (_, t) = self._items.popitem(last=False)
+                    self._bytes -= t
+        return fig
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
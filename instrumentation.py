@@ -0,0 +1,135 @@
+# Instrumentation des chemins chauds : chronos d'étapes, compteurs de cache, jauges.
+# Désactivée par défaut (OSS_PROFILING=1 ou bascule du panneau ?admin=1) : etape() renvoie
+# alors un contexte vide partagé, le coût se limite à un appel de fonction.
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+ACTIF = os.environ.get("OSS_PROFILING") == "1"
+
+_NUL = nullcontext()
+_local = threading.local()
+_lock = threading.Lock()
+
+# Agrégats process : étape -> [nombre, total secondes, dernière durée]
+_etapes = {}
+_compteurs = {}
+_jauges = {}
+
+
+def activer(actif=True):
+    global ACTIF
+    ACTIF = actif
+
+
+def est_actif():
+    return ACTIF
+
+
+class Execution:
+    """Mesures d'un rerun Streamlit (ou d'un traitement batch)."""
+
+    def __init__(self):
+        self.debut = time.time()
+        self.etapes = []
+        self.compteurs = {}
+        self.jauges = {}
+
+    def total(self):
+        return sum(d for _, d in self.etapes)
+
+
+class _Etape:
+    __slots__ = ("nom", "t0")
+
+    def __init__(self, nom):
+        self.nom = nom
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duree = time.perf_counter() - self.t0
+        with _lock:
+            agg = _etapes.setdefault(self.nom, [0, 0.0, 0.0])
+            agg[0] += 1
+            agg[1] += duree
+            agg[2] = duree
+        run = getattr(_local, "run", None)
+        if run is not None:
+            run.etapes.append((self.nom, duree))
+        return False
+
+
+def demarrer_execution():
+    _local.run = Execution() if ACTIF else None
+    return _local.run
+
+
+def etape(nom):
+    return _Etape(nom) if ACTIF else _NUL
+
+
+def compter(nom, resultat, n=1):
+    if not ACTIF:
+        return
+    with _lock:
+        _compteurs[(nom, resultat)] = _compteurs.get((nom, resultat), 0) + n
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.compteurs[(nom, resultat)] = run.compteurs.get((nom, resultat), 0) + n
+
+
+def jauge(nom, valeur):
+    if not ACTIF:
+        return
+    with _lock:
+        _jauges[nom] = valeur
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.jauges[nom] = valeur
+
+
+def instantane():
+    with _lock:
+        return {k: list(v) for k, v in _etapes.items()}, dict(_compteurs), dict(_jauges)
+
+
+# --- Exports ---
+def export_jsonl(run=None):
+    """Une ligne JSON par étape / compteur / jauge (du rerun si fourni, sinon agrégats process)."""
+    lignes = []
+    if run is not None:
+        horodatage = run.debut
+        lignes += [{"type": "etape", "nom": n, "secondes": d, "ts": horodatage} for n, d in run.etapes]
+        lignes += [{"type": "compteur", "nom": n, "resultat": r, "valeur": v, "ts": horodatage} for (n, r), v in run.compteurs.items()]
+        lignes += [{"type": "jauge", "nom": n, "valeur": v, "ts": horodatage} for n, v in run.jauges.items()]
+    else:
+        etapes, compteurs, jauges = instantane()
+        lignes += [{"type": "etape", "nom": n, "nombre": c, "secondes_total": t, "secondes_derniere": d} for n, (c, t, d) in etapes.items()]
+        lignes += [{"type": "compteur", "nom": n, "resultat": r, "valeur": v} for (n, r), v in compteurs.items()]
+        lignes += [{"type": "jauge", "nom": n, "valeur": v} for n, v in jauges.items()]
+    return "".join(json.dumps(l, ensure_ascii=False) + "\n" for l in lignes)
+
+
+def _label(valeur):
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def export_prometheus():
+    """Agrégats process au format texte Prometheus."""
+    etapes, compteurs, jauges = instantane()
+    lignes = ["# TYPE oss_etape_secondes summary"]
+    for nom, (c, t, _) in sorted(etapes.items()):
+        lignes.append(f'oss_etape_secondes_sum{{etape="{_label(nom)}"}} {t}')
+        lignes.append(f'oss_etape_secondes_count{{etape="{_label(nom)}"}} {c}')
+    lignes.append("# TYPE oss_cache_total counter")
+    for (nom, res), v in sorted(compteurs.items()):
+        lignes.append(f'oss_cache_total{{cache="{_label(nom)}",resultat="{_label(res)}"}} {v}')
+    lignes.append("# TYPE oss_jauge gauge")
+    for nom, v in sorted(jauges.items()):
+        lignes.append(f'oss_jauge{{nom="{_label(nom)}"}} {v}')
+    return "\n".join(lignes) + "\n"
@@ -0,0 +1,39 @@
+# Pagination côté serveur des tableaux détaillés : filtre et tri appliqués au frame
+# en mémoire, seule la page visible est sérialisée vers le navigateur.
+import math
+
+import numpy as np
+
+
+def filtrer_texte(df, texte, colonnes=('Reseau',)):
+    """Lignes dont une des colonnes contient texte (insensible à la casse)."""
+    if not texte:
+        return df
+    texte = texte.lower()
+    masque = np.zeros(len(df), dtype=bool)
+    for c in colonnes:
+        s = df[c]
+        if hasattr(s, 'cat'):
+            # Catégories filtrées une fois, puis comparaison sur les codes
+            cats = [i for i, v in enumerate(s.cat.categories) if texte in str(v).lower()]
+            masque |= np.isin(s.cat.codes.to_numpy(), cats)
+        else:
+            masque |= s.astype(str).str.lower().str.contains(texte, regex=False).to_numpy()
+    return df[masque]
+
+
+def paginer(df, page=1, taille=50, tri=None, croissant=True, texte=None, colonnes_texte=('Reseau',)):
+    """(page_df, nb_lignes filtrées, nb_pages) ; page commence à 1 et est bornée."""
+    df = filtrer_texte(df, texte, colonnes_texte)
+    total = len(df)
+    nb_pages = max(1, math.ceil(total / taille))
+    page = min(max(1, page), nb_pages)
+    debut, fin = (page - 1) * taille, page * taille
+    if tri is None:
+        return df.iloc[debut:fin], total, nb_pages
+    col = df[tri]
+    if col.dtype.kind in 'iufM' and fin < total:
+        # Top-k partiel au lieu d'un tri complet
+        haut = df.nsmallest(fin, tri, keep='first') if croissant else df.nlargest(fin, tri, keep='first')
+        return haut.iloc[debut:fin], total, nb_pages
+    return df.sort_values(tri, ascending=croissant, kind='stable').iloc[debut:fin], total, nb_pages
@@ -0,0 +1,113 @@
+# Rafraîchissement des données en tâche de fond (stale-while-revalidate).
+# Un thread recharge la source à intervalle fixe et publie un nouvel instantané par
+# simple affectation : les sessions lisent toujours le dernier instantané valide,
+# sans jamais attendre le réseau. En cas d'échec, l'instantané précédent est conservé.
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from analytics import IndicateursGlissants
+from instrumentation import compter, etape
+from reporting import construire_cube, construire_index
+
+INTERVALLE = int(os.environ.get("OSS_REFRESH_SECONDES", "600"))
+
+
+@dataclass(frozen=True)
+class Instantane:
+    df: object
+    version: str
+    donnees_au: float     # horodatage du contenu (téléchargement ou snapshot disque)
+    verifie_le: float     # dernière revalidation réussie auprès de la source
+    cube: object = None          # agrégats, index (Reseau, Date) et indicateurs glissants
+    index: object = None         # construits une fois par version, dans le thread de fond
+    indicateurs: object = None
+
+
+class Rafraichisseur:
+    """Publie le dernier frame valide d'une source (SheetSource ou SourceRegistry)."""
+
+    def __init__(self, source, intervalle=INTERVALLE, bases=None):
+        self.source = source
+        self.intervalle = intervalle
+        self.bases = bases              # abonnés de départ par réseau (analytics.charger_bases)
+        self.erreur = None              # (horodatage, message) du dernier échec, None après un succès
+        self._instantane = None
+        self._pret = threading.Event()     # première tentative terminée (succès ou échec)
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def demarrer(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._boucle, name="oss-rafraichissement", daemon=True)
+                self._thread.start()
+        return self
+
+    def arreter(self):
+        self._arret.set()
+        self._reveil.set()
+
+    def demander(self):
+        """Force un rafraîchissement immédiat (sans attendre l'intervalle)."""
+        self._reveil.set()
+
+    def instantane(self, attente=None):
+        """Dernier instantané publié ; attente (s) ne sert qu'au premier chargement à froid
+        et s'arrête dès la première tentative, même en échec (None, self.erreur renseigné)."""
+        if self._instantane is None and attente:
+            self._pret.wait(attente)
+        return self._instantane
+
+    def _publier(self, df, version, donnees_au, verifie_le):
+        courant = self._instantane
+        if courant is not None and courant.version == version:
+            df, cube, index, indicateurs = courant.df, courant.cube, courant.index, courant.indicateurs
+        else:
+            with etape("rafraichissement.preparation"):
+                cube = construire_cube(df, version)
+                index = construire_index(df, version)
+                # Prolongé depuis l'instantané précédent (qui reste intact pour ses lecteurs)
+                indicateurs = (courant.indicateurs.prolonger(df, version) if courant is not None
+                               else IndicateursGlissants.depuis_frame(df, version, self.bases))
+        # Affectation atomique : un lecteur voit l'ancien ou le nouvel instantané, jamais un mélange
+        self._instantane = Instantane(df, version, donnees_au or verifie_le, verifie_le, cube, index, indicateurs)
+        self._pret.set()
+
+    def charger_cache(self):
+        # Démarrage à chaud : snapshot disque publié avant le premier appel réseau
+        df = self.source.charger_cache()
+        if df is not None and self._instantane is None:
+            self._publier(df, self.source.version, self.source.recupere, None)
+
+    def rafraichir(self):
+        # Chargement et préparation (cube, index, indicateurs) : un échec de l'un ou de l'autre
+        # conserve l'instantané précédent et laisse le thread en vie pour le prochain cycle
+        try:
+            with etape("rafraichissement"):
+                df = self.source.refresh()
+                maintenant = time.time()
+                self._publier(df, self.source.version, self.source.recupere or maintenant, maintenant)
+        except Exception as e:
+            self.erreur = (time.time(), str(e))
+            compter("rafraichissement", "echec")
+            # Réveille les sessions en attente à froid : elles affichent l'erreur au lieu d'attendre
+            self._pret.set()
+            return False
+        self.erreur = None
+        compter("rafraichissement", "ok")
+        return True
+
+    def _boucle(self):
+        try:
+            self.charger_cache()
+        except Exception as e:
+            self.erreur = (time.time(), str(e))
+        while not self._arret.is_set():
+            self.rafraichir()
+            # Sans aucun instantané, nouvel essai rapproché plutôt qu'après l'intervalle complet
+            self._reveil.wait(self.intervalle if self._instantane is not None else min(self.intervalle, 30))
+            self._reveil.clear()
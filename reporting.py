@@ -0,0 +1,84 @@
+# Coeur du reporting, sans Streamlit : fonctions pures utilisées par app.py,
+# par les benchmarks (bench.py) et par tout traitement hors navigateur.
+import numpy as np
+
+from assistant import agent_oss
+from comparaison import periode_reference
+from data_source import parser_csv
+from rollup import RollupCube, agreger_periode, taux_engagement, variation
+from selection import IndexReseaux
+
+KPI_COLONNES = ['Impressions', 'Portee', 'Engagements', 'Nouveaux Abonnes']
+
+
+def charger_csv(data):
+    """Octets CSV (format de la Google Sheet) -> frame typé, comme load_data()."""
+    return parser_csv(data)
+
+
+def periode_precedente(debut, fin):
+    """Période de même durée juste avant [debut, fin]."""
+    return periode_reference(debut, fin, "precedente")
+
+
+def masque(df, debut, fin, reseaux):
+    # Comparaisons datetime64 vectorisées (pas de .dt.date, qui crée un objet date par ligne)
+    dates = df['Date'].to_numpy()
+    return (dates >= np.datetime64(debut, 'D')) & (dates < np.datetime64(fin, 'D') + 1) & df['Reseau'].isin(reseaux).to_numpy()
+
+
+def filtrer(df, debut, fin, reseaux):
+    """Lignes de [debut, fin] pour reseaux, triées par date.
+
+    Sélection contiguë (cas courant : tous les réseaux) : vue iloc sans copie du frame partagé."""
+    m = masque(df, debut, fin, reseaux)
+    idx = np.flatnonzero(m)
+    if len(idx) and idx[-1] - idx[0] + 1 == len(idx):
+        res = df.iloc[idx[0]:idx[-1] + 1]
+    else:
+        res = df.loc[m]
+    return res if res['Date'].is_monotonic_increasing else res.sort_values(by='Date')
+
+
+def get_kpi(df_filt, df_prev, col):
+    v = df_filt[col].sum()
+    p = df_prev[col].sum()
+    return int(v), variation(v, p)
+
+
+def kpis(df, debut, fin, reseaux):
+    """KPIs par scan du frame : référence pour RollupCube.kpis()."""
+    df_filt = filtrer(df, debut, fin, reseaux)
+    df_prev = df.loc[masque(df, *periode_precedente(debut, fin), reseaux)]
+    res = {c: get_kpi(df_filt, df_prev, c) for c in KPI_COLONNES}
+    taux = taux_engagement(res['Engagements'][0], res['Impressions'][0])
+    taux_p = taux_engagement(df_prev['Engagements'].sum(), df_prev['Impressions'].sum())
+    res['Taux'] = (taux, taux - taux_p)
+    return res
+
+
+def construire_cube(df, version=None):
+    return RollupCube(df, version)
+
+
+def construire_index(df, version=None):
+    """Positions par (Reseau, Date), sans copie du frame ; index.selection() remplace filtrer() sur le chemin chaud."""
+    return IndexReseaux(df, version)
+
+
+def top3(df_filt, col='Engagements'):
+    return df_filt.nlargest(3, col)[['Date', 'Reseau', col]]
+
+
+def cumul_abonnes(df_filt):
+    # assign (copy-on-write) : les colonnes existantes restent partagées avec df_filt
+    return df_filt.assign(Cumul=df_filt.groupby('Reseau', observed=True)['Nouveaux Abonnes'].cumsum())
+
+
+def par_periode(df_filt, freq='M', colonne='Mois'):
+    return agreger_periode(df_filt, freq, colonne)
+
+
+def repondre(question, cube, debut, fin, reseaux, aujourdhui=None, indicateurs=None):
+    return agent_oss(question, cube, debut, fin, reseaux, aujourdhui, indicateurs)
+
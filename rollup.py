@@ -0,0 +1,143 @@
+# Cube de rollup journalier par réseau : sommes préfixes sur un index datetime64 trié.
+# Construit une fois par rafraîchissement des données ; toute requête
+# (période, réseaux) coûte O(log n) par réseau au lieu d'un scan du frame.
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from schema import METRIQUES
+
+COLS_MENSUEL = ['Impressions', 'Portee', 'Engagements', 'Nouveaux Abonnes', 'Interactions']
+# Granularités du tableau récapitulatif : libellé de la colonne -> fréquence pandas
+GRANULARITES = {'Semaine': 'W', 'Mois': 'M', 'Trimestre': 'Q'}
+
+
+def _jour(d):
+    return np.datetime64(pd.Timestamp(d).normalize(), 'D')
+
+
+def variation(v, p):
+    return ((v - p) / p * 100) if p > 0 else 0
+
+
+def taux_engagement(eng, imp):
+    return (eng / imp * 100) if imp > 0 else 0
+
+
+def taux_vect(eng, imp):
+    # Division masquée : 0 quand il n'y a pas d'impressions
+    eng = np.asarray(eng, dtype=np.float64)
+    imp = np.asarray(imp, dtype=np.float64)
+    return np.divide(eng, imp, out=np.zeros_like(eng), where=imp > 0) * 100
+
+
+def agreger_periode(df, freq='M', colonne='Mois'):
+    """Sommes par (période, réseau) d'un frame brut, avec le taux d'engagement en float."""
+    cles = df['Date'].dt.to_period(freq).rename(colonne)
+    grp = df.groupby([cles, 'Reseau'], observed=True)[COLS_MENSUEL].sum().reset_index()
+    grp['Taux'] = taux_vect(grp['Engagements'], grp['Impressions'])
+    return grp
+
+
+class RollupCube:
+    def __init__(self, df, version=None):
+        self.version = version
+        # Sommes en int64 même si le frame est en int32 (pas de débordement)
+        self.dtypes = {c: np.dtype(np.int64) if df[c].dtype.kind in 'iu' else df[c].dtype for c in METRIQUES}
+        self.dtype_reseau = df['Reseau'].dtype
+        self.reseaux = {}
+        if df.empty:
+            return
+        jours = df['Date'].values.astype('datetime64[D]')
+        daily = (df[METRIQUES].assign(Jour=jours, Reseau=df['Reseau'].values, n=1)
+                 .groupby(['Reseau', 'Jour'], sort=True, observed=True).sum())
+        for net, bloc in daily.groupby(level='Reseau', sort=False, observed=True):
+            valeurs = bloc[METRIQUES + ['n']].to_numpy(dtype=np.float64)
+            prefixe = np.zeros((len(valeurs) + 1, valeurs.shape[1]))
+            np.cumsum(valeurs, axis=0, out=prefixe[1:])
+            self.reseaux[net] = (bloc.index.get_level_values('Jour').values.astype('datetime64[D]'), prefixe)
+
+    def _bornes(self, net, debut, fin):
+        # Indices [i, j) des jours compris entre debut et fin inclus
+        dates, _ = self.reseaux[net]
+        return np.searchsorted(dates, _jour(debut), 'left'), np.searchsorted(dates, _jour(fin), 'right')
+
+    def _sommes_entre(self, net, bords):
+        # Sommes entre bords consécutifs [bords[k], bords[k+1])
+        dates, prefixe = self.reseaux[net]
+        idx = np.searchsorted(dates, bords, 'left')
+        return prefixe[idx[1:]] - prefixe[idx[:-1]]
+
+    def totaux(self, debut, fin, reseaux):
+        return self.totaux_multi([(debut, fin)], reseaux)[0]
+
+    def totaux_multi(self, periodes, reseaux):
+        """Totaux de plusieurs périodes [(debut, fin), ...] : une seule recherche par réseau."""
+        bords = np.array([b for d, f in periodes for b in (_jour(d), _jour(f) + 1)], dtype='datetime64[D]')
+        tot = np.zeros((len(periodes), len(METRIQUES) + 1))
+        for net in reseaux:
+            if net not in self.reseaux:
+                continue
+            dates, prefixe = self.reseaux[net]
+            idx = np.searchsorted(dates, bords, 'left').reshape(-1, 2)
+            idx[:, 1] = np.maximum(idx[:, 1], idx[:, 0])  # période vide si fin < debut
+            tot += prefixe[idx[:, 1]] - prefixe[idx[:, 0]]
+        res = []
+        for ligne in tot:
+            r = dict(zip(METRIQUES, ligne[:-1]))
+            r['n'] = int(ligne[-1])
+            res.append(r)
+        return res
+
+    def meilleur_jour(self, debut, fin, reseaux, metrique='Engagements'):
+        """(jour, réseau, valeur) du maximum journalier de la métrique, ou None."""
+        k = METRIQUES.index(metrique)
+        meilleur = None
+        for net in reseaux:
+            if net not in self.reseaux:
+                continue
+            i, j = self._bornes(net, debut, fin)
+            if j <= i:
+                continue
+            dates, prefixe = self.reseaux[net]
+            jour = np.diff(prefixe[i:j + 1, k])
+            a = int(np.argmax(jour))
+            if meilleur is None or jour[a] > meilleur[2]:
+                meilleur = (pd.Timestamp(dates[i + a]), net, jour[a])
+        return meilleur
+
+    def kpis(self, debut, fin, reseaux):
+        """KPIs de la période + variations vs la période de même durée juste avant."""
+        duree = (fin - debut).days
+        return self.kpis_vs(debut, fin, debut - timedelta(days=duree + 1), debut - timedelta(days=1), reseaux)
+
+    def kpis_vs(self, debut, fin, ref_debut, ref_fin, reseaux):
+        """KPIs de [debut, fin] + variations vs [ref_debut, ref_fin], calculés ensemble."""
+        cur, prv = self.totaux_multi([(debut, fin), (ref_debut, ref_fin)], reseaux)
+        res = {c: (int(cur[c]), variation(cur[c], prv[c])) for c in METRIQUES}
+        taux = taux_engagement(int(cur['Engagements']), int(cur['Impressions']))
+        taux_p = taux_engagement(prv['Engagements'], prv['Impressions'])
+        res['Taux'] = (taux, taux - taux_p)
+        res['n'] = cur['n']
+        return res
+
+    def par_periode(self, debut, fin, reseaux, freq='M', colonne='Mois'):
+        """Même résultat que agreger_periode() sur la période filtrée, sans scanner le frame."""
+        d0, d1 = _jour(debut), _jour(fin)
+        periodes = pd.period_range(pd.Timestamp(debut), pd.Timestamp(fin), freq=freq)
+        bords = np.append(periodes.start_time.values.astype('datetime64[D]'), d1 + 1)
+        bords[0] = d0
+        nets = sorted(r for r in reseaux if r in self.reseaux)
+        sommes = np.zeros((len(periodes), 0, len(METRIQUES) + 1))
+        if nets:
+            sommes = np.stack([self._sommes_entre(net, bords) for net in nets], axis=1)
+        # Lignes ordonnées (période, réseau) comme un groupby trié
+        sommes = sommes.reshape(-1, len(METRIQUES) + 1)
+        grp = pd.DataFrame(sommes[:, :-1], columns=METRIQUES)
+        grp.insert(0, 'Reseau', pd.Series(np.tile(np.array(nets, dtype=object), len(periodes))).astype(self.dtype_reseau))
+        grp.insert(0, colonne, periodes.repeat(len(nets)))
+        grp = grp[sommes[:, -1] > 0].reset_index(drop=True)
+        grp = grp.astype({c: self.dtypes[c] for c in COLS_MENSUEL})[[colonne, 'Reseau'] + COLS_MENSUEL]
+        grp['Taux'] = taux_vect(grp['Engagements'], grp['Impressions'])
+        return grp
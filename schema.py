@@ -0,0 +1,74 @@
+# Schéma typé du frame chargé : réseaux en catégories, métriques en entiers compacts.
+# Les lignes invalides sont comptées (et non plus ignorées silencieusement).
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+METRIQUES = ['Impressions', 'Portee', 'Engagements', 'Reactions', 'Interactions', 'Nouveaux Abonnes']
+
+# int32 au minimum : les sommes et cumuls restent sans débordement
+INT_MIN = np.int32
+# Dates acceptées : au-delà (faute de frappe type 01/01/9999), la ligne est comptée invalide.
+# Les indicateurs glissants (analytics.py) allouent un tableau par jour calendaire couvert.
+DATE_MIN = pd.Timestamp('2000-01-01')
+DATE_MAX = pd.Timestamp('2100-12-31')
+
+
+def nouveau_rapport():
+    return {"lignes_lues": 0, "lignes_malformees": 0, "dates_invalides": 0, "reseaux_manquants": 0, "valeurs_invalides": 0}
+
+
+def fusionner_rapports(rapports):
+    total = nouveau_rapport()
+    for r in rapports:
+        for k, v in r.items():
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+def _entier_compact(s):
+    valeurs = s.to_numpy()
+    if not np.array_equal(valeurs, np.floor(valeurs)):
+        return s.astype(np.float64)
+    info = np.iinfo(INT_MIN)
+    if len(valeurs) == 0 or (valeurs.min() >= info.min and valeurs.max() <= info.max):
+        return s.astype(INT_MIN)
+    return s.astype(np.int64)
+
+
+def appliquer_schema(df, rapport=None):
+    """Convertit un frame brut (Date déjà parsée) vers le schéma compact ; met à jour rapport."""
+    rapport = rapport if rapport is not None else nouveau_rapport()
+    dates_ok = df['Date'].between(DATE_MIN, DATE_MAX)   # NaT exclu
+    rapport["dates_invalides"] += int((~dates_ok).sum())
+    # Réseau vide : ligne écartée (sinon une catégorie parasite apparaît dans le filtre RÉSEAUX)
+    reseau = df['Reseau'].astype('string')
+    reseau_ok = reseau.notna() & (reseau.str.strip() != "")
+    rapport["reseaux_manquants"] += int((dates_ok & ~reseau_ok).sum())
+    garder = (dates_ok & reseau_ok).to_numpy(dtype=bool)
+    df = df.loc[garder]
+    colonnes = {'Date': df['Date'], 'Reseau': reseau[garder].astype(str).astype('category')}
+    for c in METRIQUES:
+        num = pd.to_numeric(df[c], errors='coerce')
+        # Valeurs non numériques (hors cellules vides) : comptées puis mises à 0
+        rapport["valeurs_invalides"] += int((num.isna() & df[c].notna()).sum())
+        colonnes[c] = _entier_compact(num.fillna(0))
+    return pd.DataFrame(colonnes).reset_index(drop=True), rapport
+
+
+def concat_types(frames):
+    """pd.concat qui conserve le type catégoriel de Reseau malgré des catégories différentes."""
+    frames = [f for f in frames if f is not None]
+    if len(frames) == 1:
+        return frames[0]
+    cats = union_categoricals([f['Reseau'] for f in frames], ignore_order=True).categories
+    frames = [f.assign(Reseau=f['Reseau'].cat.set_categories(cats)) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def rapport_memoire(df):
+    """Empreinte mémoire par colonne (octets, deep=True)."""
+    octets = df.memory_usage(deep=True, index=True)
+    rapport = pd.DataFrame({'dtype': [str(df.index.dtype)] + [str(t) for t in df.dtypes], 'octets': octets.values}, index=octets.index)
+    rapport.loc['TOTAL'] = ['', int(octets.sum())]
+    return rapport
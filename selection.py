@@ -0,0 +1,58 @@
+# Sélection rapide par période et réseaux : permutation des lignes par (Reseau, Date), calculée
+# une fois par version, avec les bornes de chaque réseau. Une sélection [debut, fin] coûte deux
+# searchsorted par réseau : ni objet Python par ligne (.dt.date), ni re-tri du frame par rerun.
+# Le frame n'est pas recopié : l'index ne garde que des positions (int32) et les dates triées.
+import numpy as np
+
+from rollup import _jour
+
+
+class IndexReseaux:
+    def __init__(self, df, version=None):
+        self.version = version
+        self.df = df
+        dates = df['Date'].to_numpy()
+        reseau = df['Reseau'] if hasattr(df['Reseau'], 'cat') else df['Reseau'].astype('category')
+        codes = reseau.cat.codes.to_numpy()
+        ordre = np.lexsort((dates, codes))      # stable : à date égale, ordre du frame
+        self.ordre = ordre.astype(np.int32) if len(df) < 2 ** 31 else ordre
+        self.dates = dates[ordre]
+        # Lignes [a, b) de chaque réseau dans ordre (codes triés)
+        bords = np.searchsorted(codes[ordre], np.arange(len(reseau.cat.categories) + 1))
+        self.offsets = {net: (int(bords[i]), int(bords[i + 1])) for i, net in enumerate(reseau.cat.categories) if bords[i + 1] > bords[i]}
+        # Frame déjà chronologique (cas de la Google Sheet) : tous réseaux = une tranche contiguë
+        self._dates_frame = dates
+        self.chronologique = bool(len(dates) < 2 or (dates[1:] >= dates[:-1]).all())
+
+    @property
+    def reseaux(self):
+        return list(self.offsets)
+
+    def _position(self, dates, jour):
+        return int(np.searchsorted(dates, jour.astype(dates.dtype), 'left'))
+
+    def bornes(self, net, debut, fin):
+        """Positions [lo, hi) de net dans ordre entre debut et fin inclus (lo == hi si vide)."""
+        a, b = self.offsets.get(net, (0, 0))
+        dates = self.dates[a:b]
+        lo = a + self._position(dates, _jour(debut))
+        hi = a + self._position(dates, _jour(fin) + 1)
+        return lo, max(lo, hi)
+
+    def selection(self, debut, fin, reseaux):
+        """Lignes de [debut, fin] pour reseaux, triées par date (à date égale, ordre du frame).
+
+        Tous les réseaux d'un frame chronologique : vue iloc sans copie ; sinon seules les
+        lignes sélectionnées sont copiées (un seul take)."""
+        nets = set(reseaux) & set(self.offsets)
+        if not nets:
+            return self.df.iloc[:0]
+        if self.chronologique and len(nets) == len(self.offsets):
+            lo = self._position(self._dates_frame, _jour(debut))
+            hi = self._position(self._dates_frame, _jour(fin) + 1)
+            return self.df.iloc[lo:max(lo, hi)]
+        positions = np.concatenate([self.ordre[lo:hi] for lo, hi in (self.bornes(net, debut, fin) for net in nets)])
+        positions.sort()
+        if not self.chronologique:
+            positions = positions[np.argsort(self._dates_frame[positions], kind='stable')]
+        return self.df.take(positions)
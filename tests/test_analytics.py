@@ -0,0 +1,75 @@
+# Indicateurs glissants : le chemin incrémental doit donner exactement le calcul complet.
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import IndicateursGlissants
+from schema import METRIQUES
+
+RESEAUX = ["LinkedIn", "Instagram", "X"]
+BASES = {"LinkedIn": 1000, "X": 50}
+
+
+def _frame(debut, jours, seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(debut, periods=jours, freq="D").repeat(len(RESEAUX))
+    df = pd.DataFrame({"Date": dates, "Reseau": pd.Categorical(RESEAUX * jours, categories=RESEAUX)})
+    for c in METRIQUES:
+        df[c] = rng.integers(0, 500, len(df)).astype(np.int32)
+    # Trous : quelques jours sans ligne pour un réseau
+    return df.drop(index=df.index[::17]).reset_index(drop=True)
+
+
+def _memes_indicateurs(a, b, debut=date(2024, 1, 1), fin=date(2024, 6, 30)):
+    pd.testing.assert_frame_equal(a.serie(debut, fin, RESEAUX), b.serie(debut, fin, RESEAUX))
+    pd.testing.assert_frame_equal(a.agrege(debut, fin, RESEAUX), b.agrege(debut, fin, RESEAUX))
+    pd.testing.assert_frame_equal(a.audience(debut, fin, RESEAUX), b.audience(debut, fin, RESEAUX))
+    assert a.audience_au(fin, RESEAUX) == b.audience_au(fin, RESEAUX)
+
+
+def test_prolonger_apres_ajout_egale_le_calcul_complet():
+    ancien = _frame("2024-01-01", 90, seed=0)
+    complet = pd.concat([ancien, _frame("2024-03-28", 60, seed=1)], ignore_index=True)
+    base = IndicateursGlissants.depuis_frame(ancien, "v1", BASES)
+    prolonge = base.prolonger(complet, "v2")
+    assert prolonge.n_lignes == len(complet) and base.n_lignes == len(ancien)
+    _memes_indicateurs(prolonge, IndicateursGlissants.depuis_frame(complet, "v2", BASES))
+    # L'instantané précédent reste intact
+    _memes_indicateurs(base, IndicateursGlissants.depuis_frame(ancien, "v1", BASES))
+
+
+def test_ligne_passee_corrigee_force_un_recalcul():
+    df = _frame("2024-01-01", 120, seed=2)
+    ind = IndicateursGlissants.depuis_frame(df, "v1", BASES)
+    corrige = df.copy()
+    corrige.loc[0, "Nouveaux Abonnes"] += 100000
+    corrige.loc[5, "Engagements"] += 3000
+    assert ind.mettre_a_jour(corrige, "v2") is False
+    _memes_indicateurs(ind, IndicateursGlissants.depuis_frame(corrige, "v2", BASES))
+    # Ajout sans modification du passé : incrémental
+    plus = pd.concat([corrige, _frame("2024-05-01", 10, seed=3)], ignore_index=True)
+    assert ind.mettre_a_jour(plus, "v3") is True
+    _memes_indicateurs(ind, IndicateursGlissants.depuis_frame(plus, "v3", BASES))
+
+
+def test_ligne_retiree_force_un_recalcul():
+    df = _frame("2024-01-01", 60, seed=4)
+    ind = IndicateursGlissants.depuis_frame(df, "v1", BASES)
+    assert ind.mettre_a_jour(df.drop(index=10).reset_index(drop=True), "v2") is False
+    assert ind.audience_au(date(2024, 6, 30), RESEAUX) == pytest.approx(
+        IndicateursGlissants.depuis_frame(df.drop(index=10), None, BASES).audience_au(date(2024, 6, 30), RESEAUX))
+
+
+def test_moyenne_abonnes_agregee_egale_la_somme_par_reseau():
+    df = _frame("2024-01-01", 40, seed=5)
+    ind = IndicateursGlissants.depuis_frame(df)
+    debut, fin = date(2023, 12, 25), date(2024, 2, 15)
+    serie = ind.serie(debut, fin, RESEAUX)
+    # Jours couverts par tous les réseaux (serie s'arrête au dernier jour de chaque réseau)
+    serie = serie[serie["Date"] <= serie.groupby("Reseau", observed=True)["Date"].max().min()]
+    par_reseau = serie.groupby("Date")["Abonnes moy. 7j"].sum()
+    agrege = ind.agrege(debut, fin, RESEAUX).set_index("Date")["Abonnes moy. 7j"]
+    # Premiers jours compris : moyenne sur les jours disponibles, pas divisée par 7
+    pd.testing.assert_series_equal(agrege.loc[par_reseau.index], par_reseau, check_names=False, check_exact=False)
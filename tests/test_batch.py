@@ -0,0 +1,27 @@
+# Validation des jobs du batch avant soumission au pool.
+from batch import jobs_mensuels, valider_jobs
+
+JOB = {"nom": "sept", "debut": "2025-09-01", "fin": "2025-09-30", "reseaux": ["LinkedIn"]}
+
+
+def test_jobs_valides():
+    assert valider_jobs([JOB, dict(JOB, nom="ref", reference="custom", reference_custom=["2024-09-01", "2024-09-30"])]) == []
+    assert valider_jobs(jobs_mensuels(["2025-09"], ["LinkedIn", "A/B"], par_reseau=True)) == []
+
+
+def test_nom_ne_sort_pas_du_dossier_de_sortie():
+    for nom in ["/tmp/x", "../x", "a/b", "a\\b", "..", "", None]:
+        assert len(valider_jobs([dict(JOB, nom=nom)])) == 1, nom
+
+
+def test_reseaux_liste_de_noms():
+    assert len(valider_jobs([dict(JOB, reseaux="LinkedIn")])) == 1
+    assert len(valider_jobs([dict(JOB, reseaux=["LinkedIn", 3])])) == 1
+    assert valider_jobs([{k: v for k, v in JOB.items() if k != "reseaux"}]) == []
+
+
+def test_dates_et_reference():
+    assert len(valider_jobs([dict(JOB, debut="2025-09-31")])) == 1
+    assert len(valider_jobs([dict(JOB, fin="2025-08-01")])) == 1
+    assert len(valider_jobs([dict(JOB, reference="custom")])) == 1
+    assert len(valider_jobs([dict(JOB, reference="inconnue")])) == 1
@@ -0,0 +1,218 @@
+# SheetSource contre un serveur HTTP local (ETag / 304) et contre un fichier local.
+import hashlib
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import data_source
+from data_source import SheetSource, SourceRegistry, parser_csv
+
+ENTETE = b"Date,Reseau,Impressions,Portee,Engagements,Reactions,Interactions,Nouveaux Abonnes\n"
+LIGNES = [
+    b"01/01/2024,LinkedIn,4253,2817,2873,154,935,4672\n",
+    b"01/01/2024,Instagram,3184,3017,3292,2453,1494,4762\n",
+    b"02/01/2024,LinkedIn,1200,900,310,120,40,12\n",
+    b"02/01/2024,Instagram,800,650,95,60,20,7\n",
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        serveur = self.server
+        if serveur.statuts:
+            # Réponses d'erreur programmées (une par requête)
+            serveur.requetes.append(None)
+            self.send_error(serveur.statuts.pop(0))
+            return
+        etag = '"%s"' % hashlib.sha1(serveur.body).hexdigest()
+        serveur.requetes.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(serveur.body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(serveur.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serveur():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.body = ENTETE + b"".join(LIGNES[:2])
+    srv.requetes = []
+    srv.statuts = []
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    srv.url = f"http://127.0.0.1:{srv.server_address[1]}/data.csv"
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _attendu(body):
+    return parser_csv(body)
+
+
+def _egaux(df, attendu):
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), attendu.reset_index(drop=True), check_dtype=False, check_categorical=False)
+
+
+def test_304_renvoie_le_frame_en_memoire(serveur, tmp_path):
+    source = SheetSource(serveur.url, cache_dir=str(tmp_path), retries=0)
+    df = source.refresh()
+    assert source.refresh() is df
+    assert serveur.requetes[1] == source.meta["etag"]
+    assert source.stats == {"requetes": 2, "non_modifie": 1, "ajout": 0, "complet": 1}
+
+
+def test_ajout_ne_parse_que_les_nouvelles_lignes(serveur, tmp_path, monkeypatch):
+    source = SheetSource(serveur.url, cache_dir=str(tmp_path), retries=0)
+    source.refresh()
+    serveur.body += b"".join(LIGNES[2:])
+    parses = []
+    original = data_source.parser_csv
+    monkeypatch.setattr(data_source, "parser_csv", lambda data, *a, **k: parses.append(data) or original(data, *a, **k))
+    df = source.refresh()
+    assert source.stats["ajout"] == 1 and source.stats["complet"] == 1
+    assert parses == [b"".join(LIGNES[2:])]
+    _egaux(df, _attendu(serveur.body))
+    assert source.rapport["lignes_lues"] == 4
+
+
+def test_prefixe_modifie_force_un_parse_complet(serveur, tmp_path):
+    source = SheetSource(serveur.url, cache_dir=str(tmp_path), retries=0)
+    source.refresh()
+    serveur.body = ENTETE + LIGNES[0].replace(b"4253", b"9999") + b"".join(LIGNES[1:])
+    df = source.refresh()
+    assert source.stats["complet"] == 2 and source.stats["ajout"] == 0
+    _egaux(df, _attendu(serveur.body))
+
+
+def test_derniere_ligne_sans_saut_de_ligne(serveur, tmp_path):
+    source = SheetSource(serveur.url, cache_dir=str(tmp_path), retries=0)
+    serveur.body = ENTETE + b"".join(LIGNES[:2]) + LIGNES[2].rstrip(b"\n")
+    df = source.refresh()
+    # Ligne visible, mais hors rapport de validation et ré-parsée une fois terminée
+    assert len(df) == 3
+    assert source.rapport["lignes_lues"] == 2
+    serveur.body = ENTETE + b"".join(LIGNES)
+    df = source.refresh()
+    assert source.stats["ajout"] == 1
+    assert source.rapport["lignes_lues"] == 4
+    _egaux(df, _attendu(serveur.body))
+
+
+def test_derniere_ligne_tronquee(serveur, tmp_path):
+    source = SheetSource(serveur.url, cache_dir=str(tmp_path), retries=0)
+    serveur.body = ENTETE + b"".join(LIGNES[:2]) + LIGNES[2][:20]
+    # Moins de colonnes que prévu : ignorée jusqu'à ce qu'elle soit complète
+    _egaux(source.refresh(), _attendu(ENTETE + b"".join(LIGNES[:2])))
+    serveur.body = ENTETE + b"".join(LIGNES)
+    _egaux(source.refresh(), _attendu(serveur.body))
+    assert source.stats["ajout"] == 1
+
+
+def test_demarrage_a_chaud_depuis_le_parquet(serveur, tmp_path, monkeypatch):
+    source = SheetSource(serveur.url, cache_dir=str(tmp_path), retries=0)
+    attendu = source.refresh()
+
+    def interdit(*args, **kwargs):
+        raise AssertionError("le CSV ne doit pas être re-parsé")
+
+    monkeypatch.setattr(data_source, "parser_csv", interdit)
+    froid = SheetSource(serveur.url, cache_dir=str(tmp_path), retries=0)
+    _egaux(froid.charger_cache(), attendu)
+    assert froid.version == source.version
+    # Revalidation conditionnelle avec l'ETag du snapshot : 304, toujours sans parse
+    assert froid.refresh() is froid.charger_cache()
+    assert froid.stats["non_modifie"] == 1
+
+
+def test_fichier_local(tmp_path):
+    chemin = tmp_path / "data.csv"
+    chemin.write_bytes(ENTETE + b"".join(LIGNES[:2]))
+    source = SheetSource(str(chemin), cache_dir=str(tmp_path / "cache"))
+    df = source.refresh()
+    # ETag local = (mtime, taille) : fichier inchangé, pas de relecture
+    assert source.refresh() is df
+    assert source.stats["non_modifie"] == 1
+    with open(chemin, "ab") as f:
+        f.write(b"".join(LIGNES[2:]))
+    df = source.refresh()
+    assert source.stats["ajout"] == 1
+    _egaux(df, _attendu(chemin.read_bytes()))
+
+
+# --- SourceRegistry : fichiers locaux + stub HTTP ---
+def test_registre_fusionne_fichiers_et_http(serveur, tmp_path):
+    fichier = tmp_path / "instagram.csv"
+    fichier.write_bytes(ENTETE + b"03/01/2024,Instagram,10,9,8,7,6,5\n")
+    # Colonnes propres à la source, réseau fixé par la configuration
+    mappe = tmp_path / "linkedin.csv"
+    mappe.write_bytes(b"Jour,Vues,Reach,Engagements,Likes,Clics,Followers,Ignoree\n04/01/2024,100,90,30,20,10,3,x\n")
+    registre = SourceRegistry.depuis_config([
+        {"url": serveur.url, "nom": "http", "retries": 0},
+        {"url": str(fichier), "nom": "instagram"},
+        {"url": str(mappe), "nom": "linkedin", "reseau": "LinkedIn",
+         "colonnes": {"Jour": "Date", "Vues": "Impressions", "Reach": "Portee", "Engagements": "Engagements",
+                      "Likes": "Reactions", "Clics": "Interactions", "Followers": "Nouveaux Abonnes"}},
+    ], cache_dir=str(tmp_path / "cache"))
+    df = registre.refresh()
+    assert registre.erreurs == {}
+    assert len(df) == 4
+    assert list(df.columns) == list(data_source.mes_colonnes)
+    assert isinstance(df["Reseau"].dtype, pd.CategoricalDtype)
+    assert df["Impressions"].dtype.kind == "i"
+    ligne = df[df["Date"] == pd.Timestamp("2024-01-04")].iloc[0]
+    assert ligne["Reseau"] == "LinkedIn" and ligne["Impressions"] == 100 and ligne["Nouveaux Abonnes"] == 3
+    assert registre.rapport["lignes_lues"] == 4
+
+
+def test_registre_source_en_echec_garde_son_dernier_frame(serveur, tmp_path):
+    fichier = tmp_path / "local.csv"
+    fichier.write_bytes(ENTETE + b"03/01/2024,X,10,9,8,7,6,5\n")
+    registre = SourceRegistry([SheetSource(serveur.url, cache_dir=str(tmp_path), nom="http", retries=0),
+                               SheetSource(str(fichier), cache_dir=str(tmp_path), nom="local", retries=0)])
+    assert len(registre.refresh()) == 3
+    fichier.unlink()
+    df = registre.refresh()
+    assert list(registre.erreurs) == ["local"]
+    assert len(df) == 3 and "X" in set(df["Reseau"])
+
+
+def test_reessais_sur_5xx_mais_pas_sur_4xx(serveur, tmp_path, monkeypatch):
+    monkeypatch.setattr(data_source.time, "sleep", lambda s: None)
+    serveur.statuts = [503, 502]
+    source = SheetSource(serveur.url, cache_dir=str(tmp_path), retries=2)
+    assert len(source.refresh()) == 2
+    assert len(serveur.requetes) == 3
+    serveur.statuts = [404]
+    serveur.body += LIGNES[2]
+    with pytest.raises(urllib.error.HTTPError):
+        source.refresh()
+    assert len(serveur.requetes) == 4
+
+
+def test_octets_non_conserves_et_ligne_partielle_hors_parquet(serveur, tmp_path):
+    serveur.body = ENTETE + b"".join(LIGNES[:3]) + LIGNES[3].rstrip(b"\n")
+    source = SheetSource(serveur.url, cache_dir=str(tmp_path), retries=0)
+    df = source.refresh()
+    # Ni le CSV brut ni une seconde copie du frame : seulement l'empreinte du préfixe
+    assert not [k for k, v in vars(source).items() if isinstance(v, (bytes, bytearray, memoryview))]
+    assert len(df) == 4 and source._n_base == 3
+    froid = SheetSource(serveur.url, cache_dir=str(tmp_path), retries=0)
+    _egaux(froid.charger_cache(), df)
+    assert froid.rapport == source.rapport
+    serveur.body += b"\n" + LIGNES[0]
+    _egaux(froid.refresh(), _attendu(serveur.body))
+    assert froid.stats["ajout"] == 1 and froid._n_base == 5
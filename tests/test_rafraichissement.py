@@ -0,0 +1,60 @@
+# Rafraichisseur avec une source factice : publication, échecs, thread toujours vivant.
+import pandas as pd
+
+import rafraichissement
+from rafraichissement import Rafraichisseur
+
+
+def _frame(jours):
+    dates = pd.date_range("2024-01-01", periods=jours, freq="D")
+    return pd.DataFrame({
+        "Date": dates.repeat(2), "Reseau": pd.Categorical(["LinkedIn", "X"] * jours),
+        "Impressions": 100, "Portee": 80, "Engagements": 10, "Reactions": 5, "Interactions": 2, "Nouveaux Abonnes": 1,
+    })
+
+
+class _Source:
+    recupere = None
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.version = None
+
+    def charger_cache(self):
+        return None
+
+    def refresh(self):
+        df = self.frames.pop(0) if len(self.frames) > 1 else self.frames[0]
+        if isinstance(df, Exception):
+            raise df
+        self.version = str(len(df))
+        return df
+
+
+def test_echec_de_preparation_conserve_l_instantane(monkeypatch):
+    source = _Source([_frame(10), _frame(12)])
+    r = Rafraichisseur(source)
+    assert r.rafraichir()
+    avant = r.instantane()
+    original = rafraichissement.construire_cube
+
+    def panne(*args, **kwargs):
+        raise RuntimeError("cube")
+
+    monkeypatch.setattr(rafraichissement, "construire_cube", panne)
+    assert not r.rafraichir()
+    assert r.instantane() is avant and r.erreur[1] == "cube"
+    # Cycle suivant : la préparation refonctionne, l'ajout est publié
+    monkeypatch.setattr(rafraichissement, "construire_cube", original)
+    assert r.rafraichir()
+    assert r.erreur is None and len(r.instantane().df) == 24
+
+
+def test_demarrage_a_froid_en_echec_ne_bloque_pas():
+    r = Rafraichisseur(_Source([OSError("hors ligne")]), intervalle=3600).demarrer()
+    try:
+        assert r.instantane(attente=5) is None
+        assert r.erreur[1] == "hors ligne"
+        assert r._thread.is_alive()
+    finally:
+        r.arreter()
@@ -0,0 +1,63 @@
+# RollupCube vs calcul de référence par scan du frame (reporting.kpis / agreger_periode).
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import reporting
+from rollup import COLS_MENSUEL, GRANULARITES, RollupCube, agreger_periode
+from schema import METRIQUES
+
+RESEAUX = ["LinkedIn", "Instagram", "Facebook", "X"]
+DEBUT = date(2023, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def donnees():
+    # Jours manquants, plusieurs lignes par jour (heures différentes), métriques int32
+    rng = np.random.default_rng(0)
+    n = 6000
+    jours = rng.integers(0, 700, n)
+    jours = jours[(jours % 11) != 3]
+    df = pd.DataFrame({
+        "Date": pd.Timestamp(DEBUT) + pd.to_timedelta(jours, "D") + pd.to_timedelta(rng.integers(0, 4, len(jours)) * 5, "h"),
+        "Reseau": pd.Categorical(np.array(RESEAUX)[rng.integers(0, 4, len(jours))], categories=RESEAUX),
+    })
+    for c in METRIQUES:
+        df[c] = rng.integers(0, 1000, len(jours)).astype(np.int32)
+    df = df.sort_values("Date", kind="stable").reset_index(drop=True)
+    return df, RollupCube(df)
+
+
+def _cas(n=150, seed=1):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        debut = DEBUT + timedelta(int(rng.integers(-30, 720)))
+        fin = debut + timedelta(int(rng.integers(0, 250)))
+        reseaux = [r for r in RESEAUX if rng.random() < 0.6] or [RESEAUX[0]]
+        yield debut, fin, reseaux
+
+
+def test_kpis_identiques_au_scan(donnees):
+    df, cube = donnees
+    for debut, fin, reseaux in _cas():
+        attendu = reporting.kpis(df, debut, fin, reseaux)
+        obtenu = cube.kpis(debut, fin, reseaux)
+        for c in reporting.KPI_COLONNES:
+            assert obtenu[c][0] == attendu[c][0]
+            assert obtenu[c][1] == pytest.approx(attendu[c][1])
+        assert obtenu["Taux"] == pytest.approx(attendu["Taux"])
+
+
+@pytest.mark.parametrize("colonne", list(GRANULARITES))
+def test_par_periode_identique_au_groupby(donnees, colonne):
+    df, cube = donnees
+    freq = GRANULARITES[colonne]
+    for debut, fin, reseaux in _cas(60, seed=2):
+        attendu = agreger_periode(reporting.filtrer(df, debut, fin, reseaux), freq, colonne)
+        obtenu = cube.par_periode(debut, fin, reseaux, freq, colonne)
+        assert list(obtenu.columns) == [colonne, "Reseau"] + COLS_MENSUEL + ["Taux"]
+        attendu = attendu.sort_values([colonne, "Reseau"], key=lambda s: s.astype(str)).reset_index(drop=True)
+        obtenu = obtenu.sort_values([colonne, "Reseau"], key=lambda s: s.astype(str)).reset_index(drop=True)
+        pd.testing.assert_frame_equal(obtenu, attendu, check_dtype=False, check_categorical=False)
@@ -0,0 +1,25 @@
+# Validation du schéma : lignes écartées et comptées dans le rapport.
+import pandas as pd
+
+from schema import appliquer_schema
+
+
+def _brut(dates, reseaux):
+    df = pd.DataFrame({"Date": pd.to_datetime(dates, dayfirst=True, errors="coerce"), "Reseau": reseaux})
+    for c in ["Impressions", "Portee", "Engagements", "Reactions", "Interactions", "Nouveaux Abonnes"]:
+        df[c] = 1
+    return df
+
+
+def test_dates_hors_plage_comptees_invalides():
+    df, rapport = appliquer_schema(_brut(["01/01/2024", "01/01/9999", "31/12/1899", "pas une date"], ["LinkedIn"] * 4))
+    assert list(df["Date"]) == [pd.Timestamp("2024-01-01")]
+    assert rapport["dates_invalides"] == 3
+
+
+def test_reseau_vide_ecarte_et_compte():
+    df, rapport = appliquer_schema(_brut(["01/01/2024"] * 4 + ["01/01/9999"], ["LinkedIn", None, "  ", " X ", None]))
+    assert list(df["Reseau"]) == ["LinkedIn", " X "]
+    assert sorted(df["Reseau"].cat.categories) == [" X ", "LinkedIn"]
+    # Ligne déjà écartée pour sa date : comptée une seule fois
+    assert rapport["reseaux_manquants"] == 2 and rapport["dates_invalides"] == 1
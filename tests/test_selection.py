@@ -0,0 +1,46 @@
+# IndexReseaux.selection : mêmes lignes, dans le même ordre, que masque + tri stable par date.
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import reporting
+from selection import IndexReseaux
+
+RESEAUX = np.array(["LinkedIn", "Instagram", "Facebook", "X"])
+
+
+def _frame(chronologique, categoriel, n=8000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 800, n), "D") + pd.to_timedelta(rng.integers(0, 3, n) * 3, "h"),
+        "Reseau": RESEAUX[rng.integers(0, 4, n)],
+        "Impressions": rng.integers(0, 1000, n),
+    })
+    if categoriel:
+        df["Reseau"] = df["Reseau"].astype("category")
+    return df.sort_values("Date", kind="stable").reset_index(drop=True) if chronologique else df
+
+
+@pytest.mark.parametrize("chronologique", [True, False])
+@pytest.mark.parametrize("categoriel", [True, False])
+def test_selection_identique_au_filtre(chronologique, categoriel):
+    df = _frame(chronologique, categoriel)
+    index = IndexReseaux(df)
+    assert index.chronologique is chronologique
+    rng = np.random.default_rng(1)
+    for _ in range(150):
+        debut = date(2022, 12, 1) + timedelta(int(rng.integers(0, 900)))
+        fin = debut + timedelta(int(rng.integers(-3, 200)))
+        choix = list(RESEAUX[rng.random(4) < 0.6]) + (["Inconnu"] if rng.random() < 0.1 else [])
+        if rng.random() < 0.3:
+            choix = list(RESEAUX)
+        attendu = df.loc[reporting.masque(df, debut, fin, choix)].sort_values("Date", kind="stable")
+        pd.testing.assert_frame_equal(index.selection(debut, fin, choix), attendu)
+
+
+def test_tous_reseaux_vue_sans_copie():
+    df = _frame(True, True)
+    res = IndexReseaux(df).selection(date(2023, 3, 1), date(2023, 6, 30), list(RESEAUX))
+    assert np.shares_memory(res["Impressions"].to_numpy(), df["Impressions"].to_numpy())